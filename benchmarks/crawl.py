@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""Crawl the replay server from the playlist hub, stopping half way and
+resuming from the checkpoint, and report the entities per second.
+
+Usage: python benchmarks/crawl.py [--pages 10] [--workers 8]
+"""
+from __future__ import print_function
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hymusic.crawler import Crawler  # noqa: E402
+from hymusic.sources.netease import NeteaseCloud  # noqa: E402
+from hymusic.sources.qqmusic import QQMusic  # noqa: E402
+
+from replay import ReplayServer, rebase  # noqa: E402
+
+
+def crawl(source_cls, pages, workers):
+    directory = tempfile.mkdtemp()
+    try:
+        source = source_cls()
+        counts = Counter()
+        start = time.time()
+        crawler = Crawler(source, directory, max_workers=workers)
+        crawler.seed_hub(maxpage=pages)
+        total = len(crawler.frontier)
+        for obj in crawler.crawl(maxitems=total // 2):
+            counts[type(obj).__name__] += 1
+        # Resume from the checkpoint written when the crawl stopped
+        crawler = Crawler(source, directory, max_workers=workers)
+        assert crawler.resumed
+        for obj in crawler.crawl():
+            counts[type(obj).__name__] += 1
+        elapsed = time.time() - start
+        fetched = sum(counts.values())
+        print('%s: %s, %.0f entities/s, %s' % (
+            source.name, dict(counts), fetched / elapsed, crawler.stats))
+    finally:
+        shutil.rmtree(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=10)
+    parser.add_argument('--tracks', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+    with ReplayServer(tracks=args.tracks, pages=args.pages) as server:
+        for source_cls in (NeteaseCloud, QQMusic):
+            crawl(rebase(source_cls, server.root), args.pages, args.workers)
+
+
+if __name__ == '__main__':
+    main()
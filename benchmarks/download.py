@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""Download songs with DownloadManager from a local server supporting
+byte ranges, where the first request of every song fails with a 503 or
+breaks half way, and check the per-host limit, the retries and that the
+broken downloads resume instead of starting over.
+
+Usage: python benchmarks/download.py [--songs 40] [--size 1000000]
+"""
+from __future__ import print_function
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hymusic._compat import IS_PY3  # noqa: E402
+from hymusic.download import DownloadManager  # noqa: E402
+from hymusic.sources.netease import NeteaseCloud  # noqa: E402
+
+from replay import ReplayServer, rebase  # noqa: E402
+
+if IS_PY3:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+else:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+CHUNK_SIZE = 64 * 1024
+
+
+def get_content(name, size):
+    seed = int(name.split('.')[0])
+    block = bytes(bytearray((i + seed) % 256 for i in range(256)))
+    return (block * (size // 256 + 1))[:size]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(self.server.size))
+        self.end_headers()
+
+    def do_GET(self):
+        server = self.server
+        name = self.path.rsplit('/', 1)[-1]
+        with server.lock:
+            attempt = server.attempts[name] = server.attempts.get(name, 0) + 1
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        self._active = True
+        try:
+            self._reply(name, attempt)
+        finally:
+            self._leave()
+
+    def _leave(self):
+        # Called before the last bytes are sent, as the client may start
+        # the next download as soon as it receives them
+        if self._active:
+            self._active = False
+            with self.server.lock:
+                self.server.active -= 1
+
+    def _reply(self, name, attempt):
+        server = self.server
+        content = get_content(name, server.size)
+        start = 0
+        if 'Range' in self.headers:
+            start = int(self.headers['Range'][6:].split('-')[0])
+            with server.lock:
+                server.resumed += 1
+        if attempt == 1 and int(name.split('.')[0]) % 2:
+            with server.lock:
+                server.failed += 1
+            self._leave()
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(206 if start else 200)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(len(content) - start))
+        if start:
+            self.send_header('Content-Range', 'bytes %d-%d/%d' % (
+                start, len(content) - 1, len(content)))
+        self.end_headers()
+        # Break the first successful response half way
+        end = len(content) // 2 if attempt == 1 else len(content)
+        for offset in range(start, end, CHUNK_SIZE):
+            time.sleep(server.delay)
+            if offset + CHUNK_SIZE >= end:
+                self._leave()
+            self.wfile.write(content[offset:min(offset + CHUNK_SIZE, end)])
+        if end < len(content):
+            with server.lock:
+                server.broken += 1
+            self.close_connection = True
+            self.wfile.flush()
+            self.connection.shutdown(1)
+
+
+class FileServer(ThreadingMixIn, HTTPServer):
+    """Serve generated files of the size, counting the requests"""
+    daemon_threads = True
+
+    def __init__(self, size, delay=0.002):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), _Handler)
+        self.size = size
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.attempts = {}
+        self.active = self.max_active = 0
+        self.failed = self.broken = self.resumed = 0
+
+    @property
+    def root(self):
+        return 'http://%s:%d' % self.server_address[:2]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--songs', type=int, default=40)
+    parser.add_argument('--size', type=int, default=1000000)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--per-host', type=int, default=4)
+    args = parser.parse_args()
+    files = FileServer(args.size)
+    thread = threading.Thread(target=files.serve_forever)
+    thread.daemon = True
+    thread.start()
+    directory = tempfile.mkdtemp()
+    url_requests = [0]
+
+    with ReplayServer() as server:
+        class Source(rebase(NeteaseCloud, server.root)):
+            def _fetch_songs_json(self, song_ids):
+                url_requests[0] += 1
+                return super(Source, self)._fetch_songs_json(song_ids)
+
+            def get_song_url(self, song_id, quality='high'):
+                url_requests[0] += 1
+                return super(Source, self).get_song_url(song_id, quality)
+
+            def _get_song_url_from_json(self, json, quality='high'):
+                return '%s/%d.mp3' % (files.root, json['id'])
+
+        source = Source()
+        songs, _ = source.get_songs(range(30001, 30001 + args.songs))
+        url_requests[0] = 0
+        manager = DownloadManager(directory, max_workers=args.workers,
+                                  max_per_host=args.per_host, backoff=0.05)
+        try:
+            start = time.time()
+            completed, failed = manager.download(songs)
+            elapsed = time.time() - start
+            for song, filepath in completed:
+                with open(filepath, 'rb') as f:
+                    name = '%d.mp3' % song.id
+                    assert f.read() == get_content(name, args.size), name
+        finally:
+            files.shutdown()
+            shutil.rmtree(directory)
+    assert not failed, failed
+    assert files.max_active <= args.per_host
+    assert files.resumed == files.broken
+    print('%d songs in %.2f s, %.1f MB/s' % (
+        len(completed), elapsed, manager.bytes_downloaded / elapsed / 1e6))
+    print('max concurrent per host %d (limit %d), url requests %d'
+          % (files.max_active, args.per_host, url_requests[0]))
+    print('%d retried after a 503, %d broken and %d resumed with Range'
+          % (files.failed, files.broken, files.resumed))
+
+
+if __name__ == '__main__':
+    main()
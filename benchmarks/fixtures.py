@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""Response fixtures of the endpoints used by the sources.
+
+The responses are generated in the shapes the source builders read, with
+a configurable number of items. A recorded response saved as
+``benchmarks/fixtures/<name>.json`` (or ``.html`` for the Netease playlist
+hub) is served instead of the generated one with the same name.
+"""
+import io
+import json
+import os
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'fixtures')
+
+HUB_ITEM = u'''<li>
+<div class="u-cover u-cover-1">
+<img class="j-flag" src="http://p1.music.126.net/{id}.jpg?param=140y140"/>
+<a title="歌单 {id}" href="/playlist?id={id}" class="msk"></a>
+<div class="bottom"><a class="icon-play f-fr" title="播放"
+data-res-type="13" data-res-id="{id}"></a><span class="icon-headset"></span>
+<span class="nb">{id}万</span></div>
+</div>
+<p class="dec"><a title="歌单 {id}" href="/playlist?id={id}"
+class="tit f-thide s-fc0">歌单 {id}</a></p>
+<p><span class="s-fc4">by</span> <a title="用户{id}"
+href="/user/home?id={uid}" class="nm nm-icn f-thide s-fc3">用户{id}</a></p>
+</li>
+'''
+
+
+def load_recorded(name):
+    """Return the recorded response text of the name, or None"""
+    for ext in ('.json', '.html'):
+        path = os.path.join(FIXTURES_DIR, name + ext)
+        if os.path.exists(path):
+            with io.open(path, encoding='utf-8') as f:
+                return f.read()
+    return None
+
+
+def dumps(data):
+    return json.dumps(data, ensure_ascii=False)
+
+
+# NeteaseCloud
+
+def netease_artist(i):
+    return {'id': 10000 + i % 50, 'name': u'歌手 %d' % (i % 50),
+            'picUrl': 'http://p1.music.126.net/artist/%d.jpg' % i}
+
+
+def netease_album(i, songs=0):
+    rv = {'id': 20000 + i % 200, 'name': u'专辑 %d' % (i % 200),
+          'picUrl': 'http://p1.music.126.net/album/%d.jpg' % i,
+          'publishTime': 1483228800000, 'company': u'唱片公司',
+          'artist': netease_artist(i)}
+    if songs:
+        rv['songs'] = [netease_song(i * songs + j) for j in range(songs)]
+    return rv
+
+
+def netease_song(i):
+    music = {'bitrate': 320000, 'dfsId': 3000000000 + i}
+    return {'id': 30000 + i, 'name': u'歌曲 %d' % i, 'duration': 240000,
+            'artists': [netease_artist(i)], 'album': netease_album(i),
+            'hMusic': music, 'mMusic': music, 'lMusic': music,
+            'mp3Url': 'http://m2.music.126.net/%d.mp3' % i}
+
+
+def netease_user(i):
+    return {'userId': 40000 + i, 'nickname': u'用户 %d' % i, 'gender': 1,
+            'avatarUrl': 'http://p1.music.126.net/user/%d.jpg' % i,
+            'signature': u'签名'}
+
+
+def netease_playlist(i, tracks=0):
+    rv = {'id': 50000 + i, 'name': u'歌单 %d' % i,
+          'coverImgUrl': 'http://p1.music.126.net/playlist/%d.jpg' % i,
+          'trackCount': tracks, 'playCount': 1000 * i, 'bookCount': i,
+          'sharedCount': i, 'updateTime': 1483228800000,
+          'creator': netease_user(i)}
+    if tracks:
+        rv['tracks'] = [netease_song(j) for j in range(tracks)]
+    return rv
+
+
+def netease_playlist_song_ids(i, tracks=0):
+    """A playlist in the v6 detail response with the song ids only"""
+    rv = netease_playlist(i)
+    rv['trackCount'] = tracks
+    rv['trackIds'] = [{'id': 30000 + j} for j in range(tracks)]
+    return rv
+
+
+def netease_search(type_code, count):
+    builders = {1: ('songs', netease_song), 10: ('albums', netease_album),
+                100: ('artists', netease_artist),
+                1000: ('playlists', netease_playlist),
+                1002: ('userprofiles', netease_user)}
+    key, builder = builders[type_code]
+    return {'result': {key: [builder(i) for i in range(count)]}}
+
+
+def netease_hub_page(page, pages=10):
+    if page >= pages:
+        return u'<html><body><ul id="m-pl-container"></ul></body></html>'
+    items = u''.join(HUB_ITEM.format(id=100000 + page * 35 + i,
+                                     uid=200000 + page * 35 + i)
+                     for i in range(35))
+    return (u'<!DOCTYPE html><html><head><meta charset="utf-8"/></head>'
+            u'<body><div class="g-wrap p-pl f-pr"><ul class="m-cvrlst f-cb"'
+            u' id="m-pl-container">%s</ul></div></body></html>' % items)
+
+
+def netease_lyric():
+    lines = u'\n'.join(u'[%02d:%02d.%02d]歌词 %d' % (i // 60, i % 60, 0, i)
+                       for i in range(0, 240, 4))
+    return {'lrc': {'lyric': lines}, 'klyric': {'lyric': u''},
+            'tlyric': {'lyric': lines}}
+
+
+# QQMusic
+
+def qq_singer(i):
+    return {'id': 10000 + i % 50, 'mid': '001%07dS' % (i % 50),
+            'name': u'歌手 %d' % (i % 50)}
+
+
+def qq_song(i):
+    """A song in the search, playlist and album responses"""
+    return {'songid': 30000 + i, 'songmid': '002%07dM' % i,
+            'songname': u'歌曲 %d' % i, 'interval': 240,
+            'albumid': 20000 + i % 200, 'albummid': '003%07dA' % (i % 200),
+            'albumname': u'专辑 %d' % (i % 200), 'pubtime': 1483228800,
+            'singer': [qq_singer(i)]}
+
+
+def qq_song_detail(i):
+    """A song in the song detail response"""
+    return {'id': 30000 + i, 'mid': '002%07dM' % i,
+            'name': u'歌曲 %d' % i, 'interval': 240,
+            'time_public': '2017-01-01',
+            'album': {'id': 20000 + i % 200, 'mid': '003%07dA' % (i % 200),
+                      'name': u'专辑 %d' % (i % 200)},
+            'singer': [qq_singer(i)]}
+
+
+def qq_album(i, songs=0):
+    singer = qq_singer(i)
+    rv = {'id': 20000 + i % 200, 'mid': '003%07dA' % (i % 200),
+          'name': u'专辑 %d' % (i % 200), 'company': u'唱片公司',
+          'singerid': singer['id'], 'singermid': singer['mid'],
+          'singername': singer['name']}
+    if songs:
+        rv['list'] = [qq_song(i * songs + j) for j in range(songs)]
+    return rv
+
+
+def qq_album_item(i):
+    """An album in the search and artist responses"""
+    singer = qq_singer(i)
+    return {'albumID': 20000 + i % 200, 'albumMID': '003%07dA' % (i % 200),
+            'albumName': u'专辑 %d' % (i % 200),
+            'singerID': singer['id'], 'singerMID': singer['mid'],
+            'singerName': singer['name']}
+
+
+def qq_playlist_item(i):
+    """A playlist in the search and hub responses"""
+    return {'dissid': 50000 + i, 'dissname': u'歌单 %d' % i,
+            'imgurl': 'http://p.qpic.cn/music_cover/%d/300' % i,
+            'song_count': 30, 'listennum': 1000 * i,
+            'creator': {'name': u'用户 %d' % i, 'creator_uin': 40000 + i}}
+
+
+def qq_playlist(i, tracks):
+    return {'disstid': 50000 + i, 'dissname': u'歌单 %d' % i,
+            'logo': 'http://p.qpic.cn/music_cover/%d/300' % i,
+            'total_song_num': tracks, 'visitnum': 1000 * i,
+            'uin': 40000 + i, 'nickname': u'用户 %d' % i,
+            'songlist': [qq_song(j) for j in range(tracks)]}
+
+
+def qq_search(type, count):
+    if type == 'playlist':
+        return {'data': {'list': [qq_playlist_item(i)
+                                  for i in range(count)]}}
+    builder = qq_album_item if type == 'album' else qq_song
+    return {'data': {type: {'list': [builder(i) for i in range(count)]}}}
+
+
+def qq_hub_page(page, pages=10):
+    items = [] if page >= pages else [qq_playlist_item(page * 30 + i)
+                                      for i in range(30)]
+    return {'data': {'list': items}}
+
+
+def qq_categories():
+    return {'data': {'categories': [{'items': [
+        {'categoryId': 100 + i, 'categoryName': u'分类 %d' % i}
+        for i in range(20)]}]}}
+
+
+def qq_artist(i, albums=20):
+    singer = qq_singer(i)
+    return {'data': {'singer_id': singer['id'], 'singer_mid': singer['mid'],
+                     'singer_name': singer['name'],
+                     'list': [qq_album_item(i * albums + j)
+                              for j in range(albums)]}}
+
+
+def jsonp(data, callback='jsonCallback'):
+    return u'%s(%s)' % (callback, dumps(data))
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Compare the latency percentiles of get_song_url against a replay server
+stalling a fraction of its responses, with and without hedging.
+
+Usage: python benchmarks/hedge.py [--requests 500] [--stall 0.03]
+"""
+from __future__ import print_function
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hymusic.resilience import Hedger  # noqa: E402
+from hymusic.sources.netease import NeteaseCloud  # noqa: E402
+
+from replay import ReplayServer, rebase  # noqa: E402
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def measure(source, requests):
+    latencies = []
+    for i in range(requests):
+        start = time.time()
+        source.get_song_url(30001 + i % 100)
+        latencies.append(time.time() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--stall', type=float, default=0.03)
+    parser.add_argument('--stall-time', type=float, default=0.5)
+    args = parser.parse_args()
+    with ReplayServer(stall=args.stall, stall_time=args.stall_time) as server:
+        cls = rebase(NeteaseCloud, server.root)
+        hedger = Hedger()
+        for name, source in (('plain', cls()), ('hedged', cls(hedger=hedger))):
+            # Warm up the connections and the observed latencies
+            measure(source, 50)
+            latencies = measure(source, args.requests)
+            print('%s: p50 %.1f ms, p95 %.1f ms, p99 %.1f ms, max %.1f ms'
+                  % ((name,) + tuple(percentile(latencies, q) * 1000
+                                     for q in (0.5, 0.95, 0.99, 1.0))))
+        print('hedger: %s' % hedger.stats)
+        hedger.close()
+
+
+if __name__ == '__main__':
+    main()
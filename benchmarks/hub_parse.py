@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""Compare the per-page parse time of the Netease playlist hub with lxml
+XPath and with BeautifulSoup, and check they give identical results.
+
+Usage: python benchmarks/hub_parse.py [saved hub page ...]
+
+A generated page of 35 playlists is used if no saved page is given.
+"""
+from __future__ import print_function
+import io
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hymusic.sources.netease import NeteaseCloud  # noqa: E402
+
+import fixtures  # noqa: E402
+
+
+def main():
+    if len(sys.argv) > 1:
+        pages = [io.open(path, encoding='utf-8').read()
+                 for path in sys.argv[1:]]
+    else:
+        pages = [fixtures.netease_hub_page(0)]
+    source = NeteaseCloud()
+    number = 50
+    for i, text in enumerate(pages):
+        content = text.encode('utf-8')
+        fast = source._parse_playlist_hub(content)
+        slow = source._parse_playlist_hub_bs4(text)
+        assert fast == slow, 'Results differ on page %d' % i
+        fast_time = timeit.timeit(
+            lambda: source._parse_playlist_hub(content), number=number)
+        slow_time = timeit.timeit(
+            lambda: source._parse_playlist_hub_bs4(text), number=number)
+        print('page %d: %d playlists, lxml %.2f ms, bs4 %.2f ms, %.1fx'
+              % (i, len(fast), fast_time * 1000 / number,
+                 slow_time * 1000 / number, slow_time / fast_time))
+
+
+if __name__ == '__main__':
+    main()
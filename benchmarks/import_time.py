@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""Measure the time of ``import hymusic`` in fresh interpreters, compared
+with importing and creating both sources eagerly as ``import hymusic``
+did before.
+
+Usage: python benchmarks/import_time.py [runs]
+"""
+from __future__ import print_function
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = [
+    ('import hymusic', 'import hymusic'),
+    ('import hymusic; hymusic.netease',
+     'import hymusic; hymusic.netease'),
+    ('eager (before)',
+     'from hymusic.sources.netease import NeteaseCloud; '
+     'from hymusic.sources.qqmusic import QQMusic; '
+     'NeteaseCloud(); QQMusic()'),
+]
+
+CHECK = ('import sys, hymusic; '
+         'print(sorted(m for m in ("requests", "bs4", "lxml") '
+         'if m in sys.modules))')
+
+
+def run(code, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.time()
+        subprocess.check_call([sys.executable, '-c', code], cwd=ROOT)
+        timings.append(time.time() - start)
+    return min(timings)
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    baseline = run('pass', runs)
+    print('interpreter startup: %.1f ms' % (baseline * 1000))
+    for name, code in CASES:
+        print('%-34s %.1f ms' % (name, (run(code, runs) - baseline) * 1000))
+    heavy = subprocess.check_output([sys.executable, '-c', CHECK], cwd=ROOT)
+    print('heavy modules loaded by import hymusic: %s'
+          % heavy.decode().strip())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Compare the time of listing a large playlist with the songs built
+eagerly and lazily, reading only the playlist name and the first page of
+songs, and the memory retained by the playlist.
+
+Usage: python benchmarks/lazy_playlist.py [--tracks 5000] [--repeat 10]
+"""
+from __future__ import print_function
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hymusic.sources.netease import NeteaseCloud  # noqa: E402
+from hymusic.sources.qqmusic import QQMusic  # noqa: E402
+
+from replay import ReplayServer, rebase  # noqa: E402
+
+
+def list_playlist(source):
+    playlist = source.get_playlist(50001)
+    [song.name for song in playlist.songs[:20]]
+    return playlist
+
+
+def measure(source, repeat):
+    list_playlist(source)
+    start = time.time()
+    for _ in range(repeat):
+        list_playlist(source)
+    elapsed = (time.time() - start) * 1000 / repeat
+    gc.collect()
+    tracemalloc.start()
+    try:
+        playlist = list_playlist(source)  # noqa: F841
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return elapsed, retained
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tracks', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+    with ReplayServer(tracks=args.tracks) as server:
+        for source_cls in (NeteaseCloud, QQMusic):
+            cls = rebase(source_cls, server.root)
+            eager = measure(cls(), args.repeat)
+            lazy = measure(cls(lazy=True), args.repeat)
+            print('%s: eager %.1f ms %.1f MB, lazy %.1f ms %.1f MB'
+                  % (source_cls.name, eager[0], eager[1] / 1e6,
+                     lazy[0], lazy[1] / 1e6))
+
+
+if __name__ == '__main__':
+    main()
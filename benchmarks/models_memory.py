@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""Compare the memory usage of the slotted models with the previous
+dict-based models, building songs with nested albums and artists.
+
+Usage: python benchmarks/models_memory.py [number of songs]
+"""
+from __future__ import print_function
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hymusic.models import Album, Artist, Song  # noqa: E402
+
+
+class DictModel(object):
+    """The dict-based model as before"""
+    def __init__(self, source, **kwargs):
+        self.source = source
+        for k, v in kwargs.items():
+            if v is not None:
+                setattr(self, k, v)
+
+
+def build(album_cls, artist_cls, song_cls, count):
+    rv = []
+    for i in range(count):
+        artist = artist_cls(None, id=i, name='artist %d' % i,
+                            cover_url='http://example.com/%d.jpg' % i)
+        album = album_cls(None, id=i, name='album %d' % i, artist=artist,
+                          company='company', publish_time='2017-01-01',
+                          cover_url='http://example.com/%d.jpg' % i)
+        rv.append(song_cls(None, id=i, name='song %d' % i, artist=artist,
+                           album=album, duration=240,
+                           publish_time=1483228800))
+    return rv
+
+
+def measure(album_cls, artist_cls, song_cls, count):
+    tracemalloc.start()
+    songs = build(album_cls, artist_cls, song_cls, count)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del songs
+    return size
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    dict_size = measure(DictModel, DictModel, DictModel, count)
+    slots_size = measure(Album, Artist, Song, count)
+    print('songs: %d' % count)
+    print('dict models:  %.1f MiB (%d bytes/song)'
+          % (dict_size / 1048576.0, dict_size // count))
+    print('slots models: %.1f MiB (%d bytes/song)'
+          % (slots_size / 1048576.0, slots_size // count))
+    print('saved: %.1f%%' % (100.0 - 100.0 * slots_size / dict_size))
+
+
+if __name__ == '__main__':
+    main()
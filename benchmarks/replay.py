@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""A local HTTP server replaying the fixture responses of the source
+endpoints, and helpers to point the sources at it::
+
+    server = ReplayServer(tracks=1000)
+    server.start()
+    netease = rebase(NeteaseCloud, server.root)()
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hymusic._compat import IS_PY3, urlparse  # noqa: E402
+from hymusic.sources.netease import NeteaseCloud  # noqa: E402
+from hymusic.sources.qqmusic import QQMusic  # noqa: E402
+
+import fixtures  # noqa: E402
+
+if IS_PY3:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs
+else:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qs
+
+
+def rebase(source_cls, root):
+    """Return a subclass of the source class whose endpoint urls are on
+    the root url instead.
+    """
+    attrs = {}
+    for name in dir(source_cls):
+        if name.endswith('_URL') or name in ('WEB_ROOT', 'API_ROOT'):
+            url = urlparse(getattr(source_cls, name))
+            attrs[name] = root + url.path
+    for name in ('CACHE_TTLS', 'TIMEOUTS'):
+        attrs[name] = dict((root + urlparse(url).path, value)
+                           for url, value in getattr(source_cls, name).items())
+    return type(source_cls.__name__, (source_cls,), attrs)
+
+
+def _path(url):
+    return urlparse(url).path
+
+
+class Routes(object):
+    """Map the request paths to the fixture responses.
+
+    :param tracks: the number of songs in playlists
+    :param results: the number of search results
+    :param pages: the number of non-empty playlist hub pages
+    :param stall: the probability of a response to stall
+    :param stall_time: the seconds a stalled response is delayed
+    """
+    def __init__(self, tracks=1000, results=30, pages=10, stall=0.0,
+                 stall_time=1.0):
+        self.tracks = tracks
+        self.results = results
+        self.pages = pages
+        self.stall = stall
+        self.stall_time = stall_time
+        self._cache = {}
+        self.routes = sorted([
+            (_path(NeteaseCloud.SEARCH_URL), self.netease_search),
+            (_path(NeteaseCloud.SONG_URL), self.netease_song),
+            (_path(NeteaseCloud.PLAYLIST_URL), self.netease_playlist),
+            (_path(NeteaseCloud.PLAYLIST_SONG_IDS_URL),
+             self.netease_playlist_song_ids),
+            (_path(NeteaseCloud.ARTIST_URL), self.netease_artist),
+            (_path(NeteaseCloud.ALBUM_URL), self.netease_album),
+            (_path(NeteaseCloud.LYRIC_URL), self.netease_lyric),
+            (_path(NeteaseCloud.PLAYLIST_HUB_URL), self.netease_hub),
+            (_path(QQMusic.SEARCH_URL), self.qq_search),
+            (_path(QQMusic.SEARCH_PLAYLIST_URL), self.qq_search_playlist),
+            (_path(QQMusic.PLAYLIST_HUB_URL), self.qq_hub),
+            (_path(QQMusic.SONG_URL), self.qq_song),
+            (_path(QQMusic.ALBUM_URL), self.qq_album),
+            (_path(QQMusic.PLAYLIST_URL), self.qq_playlist),
+            (_path(QQMusic.ARTIST_URL), self.qq_artist),
+            (_path(QQMusic.CATEGORY_URL), self.qq_categories),
+            (_path(QQMusic.COMMENT_URL), self.qq_comment),
+        ], key=lambda item: len(item[0]), reverse=True)
+
+    def dispatch(self, path, query):
+        """Return the content type and body of the request"""
+        if self.stall and random.random() < self.stall:
+            time.sleep(self.stall_time)
+        for prefix, handler in self.routes:
+            if path.startswith(prefix):
+                return handler(query)
+        return None
+
+    def _json(self, name, build):
+        """Return the recorded response of the name, or generate one and
+        keep it for the next requests.
+        """
+        if name not in self._cache:
+            text = fixtures.load_recorded(name)
+            if text is None:
+                text = build()
+            self._cache[name] = text.encode('utf-8')
+        return 'application/json', self._cache[name]
+
+    def netease_search(self, query):
+        type_code = int(query.get('type', 1))
+        return self._json('netease_search_%d' % type_code, lambda: (
+            fixtures.dumps(fixtures.netease_search(type_code,
+                                                   self.results))))
+
+    def netease_song(self, query):
+        ids = json.loads(query['ids'])
+        return 'application/json', fixtures.dumps(
+            {'songs': [fixtures.netease_song(id - 30000) for id in ids
+                       if id >= 30000]}).encode('utf-8')
+
+    def netease_playlist(self, query):
+        return self._json('netease_playlist', lambda: fixtures.dumps(
+            {'result': fixtures.netease_playlist(1, self.tracks)}))
+
+    def netease_playlist_song_ids(self, query):
+        return self._json('netease_playlist_song_ids', lambda: fixtures.dumps(
+            {'playlist': fixtures.netease_playlist_song_ids(1, self.tracks)}))
+
+    def netease_artist(self, query):
+        return self._json('netease_artist', lambda: fixtures.dumps(
+            {'artist': fixtures.netease_artist(1),
+             'hotAlbums': [fixtures.netease_album(i) for i in range(20)]}))
+
+    def netease_album(self, query):
+        return self._json('netease_album', lambda: fixtures.dumps(
+            {'album': fixtures.netease_album(1, songs=12)}))
+
+    def netease_lyric(self, query):
+        return self._json('netease_lyric', lambda: fixtures.dumps(
+            fixtures.netease_lyric()))
+
+    def netease_hub(self, query):
+        page = int(query.get('offset', 0)) // 35
+        name = 'netease_hub_%d' % page
+        text = fixtures.load_recorded(name) or fixtures.netease_hub_page(
+            page, self.pages)
+        return 'text/html; charset=utf-8', text.encode('utf-8')
+
+    def qq_search(self, query):
+        type = {'8': 'album'}.get(query.get('t'), 'song')
+        return self._json('qq_search_%s' % type, lambda: fixtures.dumps(
+            fixtures.qq_search(type, self.results)))
+
+    def qq_search_playlist(self, query):
+        return self._json('qq_search_playlist', lambda: fixtures.dumps(
+            fixtures.qq_search('playlist', self.results)))
+
+    def qq_hub(self, query):
+        page = int(query.get('sin', 0)) // 30
+        return self._json('qq_hub_%d' % page, lambda: fixtures.dumps(
+            fixtures.qq_hub_page(page, self.pages)))
+
+    def qq_song(self, query):
+        i = int(query['songmid'][3:10])
+        return 'application/json', fixtures.dumps(
+            {'data': [fixtures.qq_song_detail(i)]}).encode('utf-8')
+
+    def qq_album(self, query):
+        return self._json('qq_album', lambda: fixtures.dumps(
+            {'data': fixtures.qq_album(1, songs=12)}))
+
+    def qq_playlist(self, query):
+        return self._json('qq_playlist', lambda: fixtures.jsonp(
+            {'cdlist': [fixtures.qq_playlist(1, self.tracks)]}))
+
+    def qq_artist(self, query):
+        return self._json('qq_artist', lambda: fixtures.jsonp(
+            fixtures.qq_artist(1)))
+
+    def qq_categories(self, query):
+        return self._json('qq_categories', lambda: fixtures.dumps(
+            fixtures.qq_categories()))
+
+    def qq_comment(self, query):
+        return 'application/json', b'{"total": 1024}'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, query):
+        path = self.path.split('?', 1)[0]
+        try:
+            rv = self.server.routes.dispatch(path, query)
+        except Exception:
+            rv = None
+        if rv is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        content_type, body = rv
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (IOError, OSError):
+            # The client timed out or took a hedged response instead
+            pass
+
+    def do_GET(self):
+        query = self.path.split('?', 1)[1] if '?' in self.path else ''
+        self._reply(dict((k, v[0]) for k, v in parse_qs(query).items()))
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('utf-8')
+        self._reply(dict((k, v[0]) for k, v in parse_qs(body).items()))
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class ReplayServer(object):
+    """Serve the fixture responses on a local port in a background thread.
+
+    :param kwargs: the arguments of :class:`Routes`
+    """
+    def __init__(self, host='127.0.0.1', port=0, **kwargs):
+        self.httpd = _ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.routes = Routes(**kwargs)
+        self._thread = None
+
+    @property
+    def root(self):
+        host, port = self.httpd.server_address[:2]
+        return 'http://%s:%d' % (host, port)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == '__main__':
+    server = ReplayServer(port=int(sys.argv[1]) if len(sys.argv) > 1 else 0)
+    print('Replaying on %s' % server.root)
+    server.httpd.serve_forever()
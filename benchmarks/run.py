@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""Run the offline benchmark suite against the local replay server and
+emit the results as JSON.
+
+Usage: python benchmarks/run.py [-o results.json] [--tracks 1000]
+       [--repeat 20]
+
+It measures the builder throughput, the end-to-end latency of search,
+get_playlist and get_playlists, and the peak memory of get_playlist.
+"""
+from __future__ import print_function
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hymusic.sources.netease import NeteaseCloud  # noqa: E402
+from hymusic.sources.qqmusic import QQMusic  # noqa: E402
+
+import fixtures  # noqa: E402
+from replay import ReplayServer, rebase  # noqa: E402
+
+
+def summarize(timings):
+    timings = sorted(timings)
+    count = len(timings)
+    return {'count': count,
+            'mean_ms': sum(timings) * 1000 / count,
+            'p50_ms': timings[count // 2] * 1000,
+            'p95_ms': timings[min(count - 1, int(count * 0.95))] * 1000,
+            'max_ms': timings[-1] * 1000}
+
+
+def timed(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.time()
+        func()
+        timings.append(time.time() - start)
+    return summarize(timings)
+
+
+def builder_throughput(source, songs, duration=1.0):
+    """Return the songs built per second by _build_song_from_json"""
+    built = 0
+    start = time.time()
+    while time.time() - start < duration:
+        for song in songs:
+            source._build_song_from_json(song)
+        built += len(songs)
+    return built / (time.time() - start)
+
+
+def peak_memory(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_source(source, songs, playlist_id, tracks, repeat):
+    return {
+        'build_song_per_sec': builder_throughput(source, songs),
+        'search': timed(lambda: source.search(u'歌曲'), repeat),
+        'get_playlist': timed(lambda: source.get_playlist(playlist_id),
+                              repeat),
+        'get_playlists': timed(lambda: list(source.get_playlists()),
+                               max(1, repeat // 5)),
+        'get_playlist_peak_memory_bytes': peak_memory(
+            lambda: source.get_playlist(playlist_id)),
+        'tracks': tracks,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-o', '--output', help='the file to write to')
+    parser.add_argument('--tracks', type=int, default=1000,
+                        help='the number of songs in playlists')
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='the number of runs of each request')
+    args = parser.parse_args()
+
+    with ReplayServer(tracks=args.tracks) as server:
+        netease = rebase(NeteaseCloud, server.root)()
+        qqmusic = rebase(QQMusic, server.root)()
+        results = {
+            'netease': bench_source(
+                netease, [fixtures.netease_song(i) for i in range(1000)],
+                50001, args.tracks, args.repeat),
+            'qqmusic': bench_source(
+                qqmusic, [fixtures.qq_song(i) for i in range(1000)],
+                50001, args.tracks, args.repeat),
+        }
+    output = {'timestamp': time.time(),
+              'python': platform.python_version(),
+              'platform': platform.platform(),
+              'results': results}
+    text = json.dumps(output, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""Compare the encode and decode time and the size of large playlists
+serialized by hymusic.serialize and by pickle.
+
+Usage: python benchmarks/serialize.py [--tracks 1000 5000 20000]
+
+The sources can't be pickled, so pickle gets the playlists as built with
+the sources detached, and the deduplicated graphs loaded by
+hymusic.serialize with the sources detached.
+"""
+from __future__ import print_function
+import argparse
+import os
+import pickle
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hymusic.serialize import dumps, loads  # noqa: E402
+from hymusic.sources.netease import NeteaseCloud  # noqa: E402
+from hymusic.sources.qqmusic import QQMusic  # noqa: E402
+
+import fixtures  # noqa: E402
+
+
+def best(func, number=5):
+    return min(timeit.repeat(func, number=1, repeat=number)) * 1000
+
+
+def detach(obj, seen):
+    """Set the sources of the models reachable from obj to None"""
+    if obj is None or id(obj) in seen:
+        return
+    seen.add(id(obj))
+    obj.source = None
+    for name in obj.references:
+        detach(getattr(obj, name, None), seen)
+    for item in getattr(obj, '_songs', None) or ():
+        detach(item, seen)
+
+
+def bench(name, source, build):
+    playlist = build()
+    data = dumps(playlist)
+    built = build()
+    detach(built, set())
+    deduplicated = loads(data, {source.name: None})
+    print('%s, %d songs: %d bytes' % (name, len(playlist.songs), len(data)))
+    print('  dumps %.1f ms, loads %.1f ms' % (
+        best(lambda: dumps(playlist)), best(lambda: loads(data, source))))
+    for label, graph in (('as built', built), ('deduplicated', deduplicated)):
+        pickled = pickle.dumps(graph, pickle.HIGHEST_PROTOCOL)
+        print('  pickle %s: %d bytes, dumps %.1f ms, loads %.1f ms' % (
+            label, len(pickled),
+            best(lambda: pickle.dumps(graph, pickle.HIGHEST_PROTOCOL)),
+            best(lambda: pickle.loads(pickled))))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tracks', type=int, nargs='+',
+                        default=[1000, 5000, 20000])
+    args = parser.parse_args()
+    netease, qqmusic = NeteaseCloud(), QQMusic()
+    for tracks in args.tracks:
+        bench('netease', netease, lambda: netease._build_playlist_from_json(
+            fixtures.netease_playlist(1, tracks)))
+        bench('qqmusic', qqmusic, lambda: qqmusic._build_playlist_from_json(
+            fixtures.qq_playlist(1, tracks)))
+
+
+if __name__ == '__main__':
+    main()
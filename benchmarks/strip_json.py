@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""Compare strip_json with the previous regex based JSONP unwrapping.
+
+Usage: python benchmarks/strip_json.py [recorded response ...]
+
+A generated QQMusic playlist response of 5000 songs is used if no recorded
+response is given.
+"""
+from __future__ import print_function
+import io
+import json
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hymusic._compat import json as json_backend, orjson  # noqa: E402
+from hymusic.utils import strip_json  # noqa: E402
+
+import fixtures  # noqa: E402
+
+
+def regex_strip_json(text):
+    return json.loads(re.findall(r'.*?(\{.*\}).*', text)[0])
+
+
+def main():
+    if len(sys.argv) > 1:
+        texts = [io.open(path, encoding='utf-8').read()
+                 for path in sys.argv[1:]]
+    else:
+        data = {'cdlist': [fixtures.qq_playlist(1, 5000)]}
+        texts = [fixtures.jsonp(data)]
+    backend = 'orjson' if orjson is not None else json_backend.__name__
+    number = 20
+    for i, text in enumerate(texts):
+        assert strip_json(text) == regex_strip_json(text)
+        new = timeit.timeit(lambda: strip_json(text), number=number)
+        old = timeit.timeit(lambda: regex_strip_json(text), number=number)
+        print('response %d (%.1f MiB): strip_json[%s] %.2f ms, '
+              'regex %.2f ms, %.1fx'
+              % (i, len(text) / 1048576.0, backend, new * 1000 / number,
+                 old * 1000 / number, old / new))
+
+
+if __name__ == '__main__':
+    main()
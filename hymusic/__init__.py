@@ -1,7 +1,56 @@
 # -*- coding: utf-8 -*-
-from .sources.netease import NeteaseCloud
-from .sources.qqmusic import QQMusic
+"""The builtin sources and their shared instances ``netease`` and
+``qqmusic`` are imported and created on first access, so that importing
+hymusic stays cheap.
+"""
+import importlib
+import sys
+import threading
 
+from .aggregate import search
 
-netease = NeteaseCloud()
-qqmusic = QQMusic()
+#: The builtin sources, mapping the names to the module and class names
+SOURCES = {'netease': ('hymusic.sources.netease', 'NeteaseCloud'),
+           'qqmusic': ('hymusic.sources.qqmusic', 'QQMusic')}
+
+_source_classes = dict((cls_name, name)
+                       for name, (_, cls_name) in SOURCES.items())
+_lock = threading.Lock()
+
+__all__ = ['search', 'get_source', 'get_source_class'] + \
+    list(SOURCES) + list(_source_classes)
+
+
+def get_source_class(name):
+    """Import and return the source class of the name"""
+    module_name, cls_name = SOURCES[name]
+    return getattr(importlib.import_module(module_name), cls_name)
+
+
+def get_source(name):
+    """Return the shared instance of the source, created on first call"""
+    module = sys.modules[__name__]
+    with _lock:
+        if name not in module.__dict__:
+            setattr(module, name, get_source_class(name)())
+    return module.__dict__[name]
+
+
+def __getattr__(name):
+    if name in SOURCES:
+        return get_source(name)
+    if name in _source_classes:
+        return get_source_class(_source_classes[name])
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+if sys.version_info < (3, 7):
+    # No module __getattr__ support, load eagerly
+    from .sources.netease import NeteaseCloud  # noqa: F401
+    from .sources.qqmusic import QQMusic  # noqa: F401
+    netease = NeteaseCloud()
+    qqmusic = QQMusic()
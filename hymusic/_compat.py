@@ -14,3 +14,8 @@ try:
     import simplejson as json
 except ImportError:
     import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""Search several sources at once and merge the results."""
+import re
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, wait
+
+#: The max difference in seconds of the durations of the same song
+DURATION_TOLERANCE = 3
+
+_brackets_re = re.compile(u'[(\\[（【].*?[)\\]）】]')
+_non_word_re = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def normalize(text):
+    """Normalize a name for comparison: fold the width and case, drop
+    bracketed suffixes such as "(Live)" and all non-word characters.
+    """
+    if not text:
+        return u''
+    text = unicodedata.normalize('NFKC', text).lower()
+    text = _brackets_re.sub(u'', text)
+    return _non_word_re.sub(u'', text)
+
+
+def _name(obj, attr):
+    value = getattr(obj, attr, None)
+    return normalize(getattr(value, 'name', None))
+
+
+def dedupe_key(item):
+    """Return the key identifying the same entity across sources"""
+    name = normalize(getattr(item, 'name', None))
+    cls_name = type(item).__name__
+    if cls_name in ('Song', 'Album'):
+        return cls_name, name, _name(item, 'artist')
+    if cls_name == 'PlayList':
+        return cls_name, name, _name(item, 'creator')
+    return cls_name, name
+
+
+def merge_results(results):
+    """Merge the result lists of several sources by interleaving them in
+    rank order, and remove the duplicates by :func:`dedupe_key`. The songs
+    with the same key are duplicates only if their durations are close.
+    """
+    seen = {}
+    rv = []
+    longest = max([len(items) for items in results] or [0])
+    for i in range(longest):
+        for items in results:
+            if i >= len(items):
+                continue
+            item = items[i]
+            key = dedupe_key(item)
+            duration = getattr(item, 'duration', None)
+            durations = seen.setdefault(key, [])
+            if durations and (duration is None or any(
+                    d is None or abs(d - duration) <= DURATION_TOLERANCE
+                    for d in durations)):
+                continue
+            durations.append(duration)
+            rv.append(item)
+    return rv
+
+
+def search(target, type='song', sources=None, timeout=5, maxresults=None,
+           **kwargs):
+    """Search the target in the sources concurrently, and merge the results
+    returned within the timeout. The sources failed or timed out are left
+    out.
+
+    :param target: the target string
+    :param type: song/album/artist/playlist/user
+    :param sources: the sources to search, default to all builtin sources
+    :param timeout: the seconds to wait for the sources
+    :param maxresults: the max number of results of each source
+    :param kwargs: the field restrictions passed to each source
+    """
+    if sources is None:
+        from hymusic import netease, qqmusic
+        sources = [netease, qqmusic]
+    if not sources:
+        return []
+    executor = ThreadPoolExecutor(len(sources))
+    try:
+        futures = [executor.submit(source.search, target, type, maxresults,
+                                   **kwargs)
+                   for source in sources]
+        wait(futures, timeout)
+    finally:
+        executor.shutdown(wait=False)
+    results = []
+    for future in futures:
+        if future.done() and future.exception() is None:
+            results.append(future.result())
+        else:
+            future.cancel()
+    return merge_results(results)
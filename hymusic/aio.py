@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""Asyncio flavour of the source API (Python 3 only).
+
+The wrapped source still does the HTTP work and the ``_build_*_from_json``
+building, the blocking calls are only moved to a thread pool and bounded
+by a per-source semaphore. The connection pool of the source is grown to
+``max_concurrency`` connections per host, so that the requests in flight
+reuse their connections::
+
+    source = AsyncSource(NeteaseCloud(), max_concurrency=20)
+    playlists = await asyncio.gather(*[source.get_playlist(id)
+                                       for id in ids])
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AsyncSource(object):
+    """Wrap a source so that its getters can be awaited.
+
+    :param source: a :class:`~hymusic.sources.BaseSource` instance
+    :param max_concurrency: the max number of requests in flight, the
+        :class:`~hymusic.pool.PoolAdapter` of the source keeps at least as
+        many connections per host, and its
+        :class:`~hymusic.resilience.Hedger` runs twice as many requests
+    :param executor: the executor to run the blocking calls in, a thread
+        pool of ``max_concurrency`` workers is created if not given
+    """
+    def __init__(self, source, max_concurrency=10, executor=None):
+        self.source = source
+        self.max_concurrency = max_concurrency
+        pool = getattr(source.session, 'pool', None)
+        if pool is not None:
+            pool.grow(max_concurrency)
+        hedger = getattr(source.session, 'hedger', None)
+        if hedger is not None:
+            hedger.grow(2 * max_concurrency)
+        self._own_executor = executor is None
+        if executor is None:
+            executor = ThreadPoolExecutor(max_concurrency)
+        self.executor = executor
+        self._semaphore = self._semaphore_loop = None
+
+    def __repr__(self):
+        return '<AsyncSource(%s, max_concurrency=%d)>' % (
+            self.source.__class__.__name__, self.max_concurrency)
+
+    @property
+    def semaphore(self):
+        # Created lazily so that it binds to the running event loop, and
+        # again if used from another loop.
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def run(self, func, *args, **kwargs):
+        """Run a blocking callable in the executor under the concurrency
+        limit of this source.
+        """
+        loop = asyncio.get_running_loop()
+        async with self.semaphore:
+            return await loop.run_in_executor(
+                self.executor, functools.partial(func, *args, **kwargs))
+
+    async def search(self, target, type='song', maxresults=None, **kwargs):
+        return await self.run(self.source.search, target, type,
+                              maxresults, **kwargs)
+
+    async def get_song(self, id):
+        return await self.run(self.source.get_song, id)
+
+    async def get_playlist(self, id):
+        return await self.run(self.source.get_playlist, id)
+
+    async def get_album(self, id):
+        return await self.run(self.source.get_album, id)
+
+    async def get_artist(self, id):
+        return await self.run(self.source.get_artist, id)
+
+    def __getattr__(self, name):
+        """Wrap the getters only some sources have, such as
+        ``get_song_url`` of Netease, so that they can be awaited.
+        """
+        source = self.__dict__.get('source')
+        func = getattr(source, name, None) if name.startswith('get_') \
+            else None
+        if not callable(func):
+            raise AttributeError('%r has no attribute %r'
+                                 % (self.__class__.__name__, name))
+
+        async def getter(*args, **kwargs):
+            return await self.run(func, *args, **kwargs)
+        return functools.update_wrapper(getter, func)
+
+    async def get_playlists(self, maxpage=None, cat=None, order=None):
+        """Iterate the playlist hub pages, use with ``async for``."""
+        pages = self.source.get_playlists(maxpage, cat, order)
+        while True:
+            page = await self.run(next, pages, None)
+            if page is None:
+                break
+            yield page
+
+    async def parse(self, obj):
+        """Load the lazy fields of a model object from the main API."""
+        await self.run(obj.parse)
+        return obj
+
+    def close(self):
+        if self._own_executor:
+            self.executor.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""HTTP response cache for the source sessions.
+
+Responses are cached in an in-memory LRU tier bounded by the total content
+size, and optionally in a SQLite database which can be shared by several
+processes::
+
+    cache = ResponseCache(path='hymusic-cache.db')
+    source = NeteaseCloud(cache=cache)
+"""
+import hashlib
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from ._compat import json
+from .utils import plain_loads
+
+#: The params which change on every request and don't affect the response
+IGNORED_PARAMS = ('rnd', 'searchid', '_', 'g_tk')
+
+
+class MemoryCache(object):
+    """An LRU cache of serialized responses bounded by the total content
+    size in bytes.
+    """
+    def __init__(self, maxsize=64 * 1024 * 1024):
+        self.maxsize = maxsize
+        self.size = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.pop(key, None)
+            if item is None:
+                return None
+            if item[0] < time.time():
+                self.size -= len(item[1][2])
+                return None
+            self._data[key] = item
+            return item[1]
+
+    def set(self, key, value, expires):
+        length = len(value[2])
+        if length > self.maxsize:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.size -= len(old[1][2])
+            self._data[key] = (expires, value)
+            self.size += length
+            while self.size > self.maxsize:
+                _, (_, evicted) = self._data.popitem(last=False)
+                self.size -= len(evicted[2])
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+
+class SQLiteCache(object):
+    """A persistent cache of serialized responses in a SQLite database,
+    ``get`` returns a tuple of the expiry time and the value.
+    """
+    def __init__(self, path, timeout=30):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=timeout,
+                                     check_same_thread=False)
+        with self._conn:
+            self._conn.execute('CREATE TABLE IF NOT EXISTS responses '
+                               '(key TEXT PRIMARY KEY, expires REAL, '
+                               'value BLOB)')
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute('SELECT expires, value FROM responses '
+                                     'WHERE key = ?', (key,)).fetchone()
+        if row is None or row[0] < time.time():
+            return None
+        return row[0], plain_loads(bytes(row[1]))
+
+    def set(self, key, value, expires):
+        data = sqlite3.Binary(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        with self._lock, self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO responses '
+                               'VALUES (?, ?, ?)', (key, expires, data))
+
+    def purge(self):
+        """Delete the expired responses"""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM responses WHERE expires < ?',
+                               (time.time(),))
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM responses')
+
+    def close(self):
+        self._conn.close()
+
+
+class ResponseCache(object):
+    """Cache the successful responses of the source sessions.
+
+    :param default_ttl: the seconds to cache the responses of endpoints
+        without a TTL, 0 to not cache them
+    :param ttls: a dict mapping endpoint urls to TTLs, which overrides the
+        ``CACHE_TTLS`` of the sources
+    :param maxsize: the max total content size of the memory tier in bytes
+    :param path: the path of the SQLite database, no persistent tier if None
+    :param ignored_params: the request params ignored in cache keys
+    """
+    def __init__(self, default_ttl=0, ttls=None, maxsize=64 * 1024 * 1024,
+                 path=None, ignored_params=IGNORED_PARAMS):
+        self.default_ttl = default_ttl
+        self.ttls = ttls or {}
+        self.memory = MemoryCache(maxsize)
+        self.disk = SQLiteCache(path) if path is not None else None
+        self.ignored_params = frozenset(ignored_params)
+        self.hits = self.misses = self.disk_hits = 0
+        self._lock = threading.Lock()
+
+    def get_ttl(self, endpoint, defaults=None):
+        if endpoint in self.ttls:
+            return self.ttls[endpoint]
+        return (defaults or {}).get(endpoint, self.default_ttl)
+
+    def make_key(self, method, url, params=None, data=None):
+        """Build the cache key from the method, url and the normalized
+        params and form data.
+        """
+        parts = [method.upper(), url, self._normalize(params),
+                 self._normalize(data)]
+        text = json.dumps(parts, sort_keys=True)
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def _normalize(self, params):
+        if not params:
+            return []
+        items = params.items() if hasattr(params, 'items') else params
+        return sorted([k, v if isinstance(v, (list, tuple)) else str(v)]
+                      for k, v in items
+                      if v is not None and k not in self.ignored_params)
+
+    def get(self, key):
+        """Return the cached response of the key or None"""
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            item = self.disk.get(key)
+            if item is not None:
+                expires, value = item
+                self.memory.set(key, value, expires)
+                with self._lock:
+                    self.disk_hits += 1
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return self._load(value)
+
+    def set(self, key, response, ttl):
+        value = self._dump(response)
+        expires = time.time() + ttl
+        self.memory.set(key, value, expires)
+        if self.disk is not None:
+            self.disk.set(key, value, expires)
+
+    @property
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'disk_hits': self.disk_hits,
+                'memory_entries': len(self.memory),
+                'memory_size': self.memory.size}
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    @staticmethod
+    def _dump(response):
+        return (response.status_code, dict(response.headers),
+                response.content, response.url, response.encoding)
+
+    @staticmethod
+    def _load(value):
+        r = requests.Response()
+        r.status_code, headers, r._content, r.url, r.encoding = value
+        r.headers = CaseInsensitiveDict(headers)
+        return r
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""A local catalog of the models built by the sources, stored in SQLite
+with a full-text index for offline search::
+
+    catalog = Catalog('catalog.db', sources=[netease, qqmusic])
+    catalog.upsert(netease.get_playlist(12345).songs)
+    catalog.search('hello', type='song')
+
+With :meth:`Catalog.attach`, every model the source builds is indexed.
+"""
+import sqlite3
+import threading
+
+from ._compat import json
+from .models import Album, Artist, Song, PlayList, User
+
+#: The version of the schema, stored in the user_version of the database
+SCHEMA_VERSION = 1
+
+#: The min length of the words matched by the trigram index, the shorter
+#: words are matched with LIKE
+MIN_MATCH_LENGTH = 3
+
+MODEL_TYPES = {'song': Song, 'album': Album, 'artist': Artist,
+               'playlist': PlayList, 'user': User}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS models (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    type TEXT NOT NULL,
+    key TEXT NOT NULL,
+    name TEXT,
+    artist TEXT,
+    album TEXT,
+    data TEXT NOT NULL,
+    UNIQUE (source, type, key)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS models_fts USING fts5(
+    name, artist, album, content='models', content_rowid='id',
+    tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS models_ai AFTER INSERT ON models BEGIN
+    INSERT INTO models_fts (rowid, name, artist, album)
+    VALUES (new.id, new.name, new.artist, new.album);
+END;
+CREATE TRIGGER IF NOT EXISTS models_ad AFTER DELETE ON models BEGIN
+    INSERT INTO models_fts (models_fts, rowid, name, artist, album)
+    VALUES ('delete', old.id, old.name, old.artist, old.album);
+END;
+CREATE TRIGGER IF NOT EXISTS models_au AFTER UPDATE ON models BEGIN
+    INSERT INTO models_fts (models_fts, rowid, name, artist, album)
+    VALUES ('delete', old.id, old.name, old.artist, old.album);
+    INSERT INTO models_fts (rowid, name, artist, album)
+    VALUES (new.id, new.name, new.artist, new.album);
+END;
+'''
+
+UPSERT = '''
+INSERT INTO models (source, type, key, name, artist, album, data)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (source, type, key) DO UPDATE SET
+    name = excluded.name,
+    artist = coalesce(excluded.artist, artist),
+    album = coalesce(excluded.album, album),
+    data = json_patch(data, excluded.data)
+'''
+
+
+def _ref_name(obj, attr):
+    return getattr(getattr(obj, attr, None), 'name', None)
+
+
+def _match_query(words):
+    """Build a FTS5 query matching all the words as substrings"""
+    return ' '.join('"%s"' % word for word in words)
+
+
+def _like_pattern(word):
+    return '%%%s%%' % (word.replace('\\', '\\\\').replace('%', '\\%')
+                       .replace('_', '\\_'))
+
+
+class Catalog(object):
+    """A persistent catalog of models with indexed search.
+
+    :param path: the path of the SQLite database
+    :param sources: the sources to bind the loaded models to, default to
+        the builtin sources
+    :param batch_size: the number of models buffered by write-through
+        before they are written
+    """
+    def __init__(self, path, sources=None, batch_size=500):
+        self.path = path
+        self.batch_size = batch_size
+        self._sources = None
+        if sources is not None:
+            self._sources = dict((source.name, source) for source in sources)
+        self._pending = []
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._migrate()
+
+    def _migrate(self):
+        """Create the tables, and rebuild the full-text index of the
+        databases created by older versions, which didn't index the
+        substrings of CJK names.
+        """
+        conn = self._conn
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        with conn:
+            if version < SCHEMA_VERSION:
+                conn.execute('DROP TABLE IF EXISTS models_fts')
+            conn.executescript(SCHEMA)
+            if version < SCHEMA_VERSION:
+                conn.execute("INSERT INTO models_fts (models_fts) "
+                             "VALUES ('rebuild')")
+                conn.execute('PRAGMA user_version = %d' % SCHEMA_VERSION)
+
+    @property
+    def sources(self):
+        if self._sources is None:
+            import hymusic
+            self._sources = {'netease': hymusic.netease,
+                             'qqmusic': hymusic.qqmusic}
+        return self._sources
+
+    def upsert(self, models):
+        """Insert or update the models and the models they reference. The
+        stored fields are merged with the new ones.
+        """
+        rows = {}
+        for obj in models:
+            self._collect(obj, rows)
+        with self._lock, self._conn:
+            self._conn.executemany(UPSERT, rows.values())
+        return len(rows)
+
+    def _collect(self, obj, rows):
+        type_name = type(obj).__name__.lower()
+        source = obj.source
+        try:
+            key = source.get_identifier(obj)
+        except AttributeError:
+            key = getattr(obj, 'id', None)
+        if key is None or (source.name, type_name, key) in rows:
+            return
+        if isinstance(obj, PlayList):
+            artist = _ref_name(obj, 'creator')
+        else:
+            artist = _ref_name(obj, 'artist')
+        rows[(source.name, type_name, key)] = (
+            source.name, type_name, str(key), getattr(obj, 'name', None),
+            artist, _ref_name(obj, 'album'), json.dumps(obj.to_dict()))
+        for attr in obj.references:
+            ref = getattr(obj, attr, None)
+            if ref is not None:
+                self._collect(ref, rows)
+        for attr in ('songs', 'hot_albums'):
+            # Only the loaded lists, don't trigger requests
+            for item in getattr(obj, '_' + attr, None) or ():
+                self._collect(item, rows)
+
+    def search(self, target, type='song', maxresults=None, **kwargs):
+        """Search the catalog, with the same signature as the search of
+        the sources. The names containing all the words of the target are
+        returned, the words shorter than ``MIN_MATCH_LENGTH`` characters
+        are matched without the index.
+
+        :param target: the target string
+        :param type: song/album/artist/playlist/user
+        :param maxresults: the max return number of results
+        """
+        words = target.replace('"', ' ').split()
+        if not words:
+            return []
+        long_words = [word for word in words
+                      if len(word) >= MIN_MATCH_LENGTH]
+        conditions, params = ['m.type = ?'], [type]
+        for word in words:
+            if len(word) < MIN_MATCH_LENGTH:
+                conditions.append("(m.name LIKE ? ESCAPE '\\' OR "
+                                  "m.artist LIKE ? ESCAPE '\\' OR "
+                                  "m.album LIKE ? ESCAPE '\\')")
+                params.extend([_like_pattern(word)] * 3)
+        if long_words:
+            query = ('SELECT m.source, m.data FROM models_fts '
+                     'JOIN models m ON m.id = models_fts.rowid '
+                     'WHERE models_fts MATCH ? AND %s ORDER BY rank')
+            params.insert(0, _match_query(long_words))
+        else:
+            query = 'SELECT m.source, m.data FROM models m WHERE %s'
+        query %= ' AND '.join(conditions)
+        if maxresults and not kwargs:
+            query += ' LIMIT ?'
+            params.append(maxresults)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        cls = MODEL_TYPES[type]
+        rv = []
+        for source_name, data in rows:
+            item = cls.from_dict(self.sources[source_name], json.loads(data))
+            if item.match_fields(kwargs):
+                rv.append(item)
+                if maxresults and len(rv) >= maxresults:
+                    break
+        return rv
+
+    def get(self, source, type, key):
+        """Return the stored model of the key, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT data FROM models WHERE source = ? AND type = ? '
+                'AND key = ?', (source, type, str(key))).fetchone()
+        if row is None:
+            return None
+        return MODEL_TYPES[type].from_dict(self.sources[source],
+                                           json.loads(row[0]))
+
+    def count(self, type=None):
+        query, params = 'SELECT count(*) FROM models', ()
+        if type is not None:
+            query, params = query + ' WHERE type = ?', (type,)
+        with self._lock:
+            return self._conn.execute(query, params).fetchone()[0]
+
+    def attach(self, source):
+        """Index every model the source creates, written in batches of
+        ``batch_size`` or on :meth:`flush`.
+        """
+        if source.name not in self.sources:
+            self.sources[source.name] = source
+        source.after_create.append(self._add)
+
+    def detach(self, source):
+        source.after_create.remove(self._add)
+        self.flush()
+
+    def _add(self, obj):
+        with self._lock:
+            self._pending.append(obj)
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        """Write the models buffered by write-through"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if pending:
+                self.upsert(pending)
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
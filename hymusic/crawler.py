@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""A resumable crawler over the graph of playlists, albums and artists.
+
+The crawl starts from the hub playlists or given seeds, and follows each
+playlist to the albums and artists of its songs, each album to its artist
+and each artist to its hot albums. The entities are fetched by a thread
+pool through the ``get_*`` methods of the source, and yielded with their
+songs or albums loaded::
+
+    crawler = Crawler(netease, 'crawl-state')
+    crawler.seed_hub(maxpage=10)
+    for obj in crawler.crawl():
+        save(obj)
+
+The visited entities are kept in a :class:`BloomFilter`, and the frontier
+and the filter are checkpointed to the directory periodically. A crawler
+created on an existing checkpoint resumes from it, the entities being
+fetched when it stopped are fetched again.
+"""
+import hashlib
+import json
+import math
+import os
+import struct
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+_replace = getattr(os, 'replace', os.rename)
+
+
+class BloomFilter(object):
+    """A set of strings in a bit array, which may report an item not
+    added as a member with the probability of ``error_rate``, but never
+    misses one added.
+
+    :param capacity: the number of items expected
+    :param error_rate: the false positive rate at the capacity
+    """
+    def __init__(self, capacity=1000000, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) /
+                               math.log(2) ** 2))
+        self.hashes = max(1, int(round(self.size / float(capacity) *
+                                       math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def __len__(self):
+        """The number of items added, approximately"""
+        return self.count
+
+    def _positions(self, item):
+        digest = hashlib.md5(item.encode('utf-8')).digest()
+        h1, h2 = struct.unpack('<QQ', digest)
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, item):
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7))
+                   for pos in self._positions(item))
+
+    def add(self, item):
+        """Add the item, return False if it is a member already"""
+        new = False
+        bits = self.bits
+        for pos in self._positions(item):
+            mask = 1 << (pos & 7)
+            if not bits[pos >> 3] & mask:
+                bits[pos >> 3] |= mask
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+    def dump(self, fp):
+        """Write the filter to a binary file"""
+        fp.write(struct.pack('<QdQ', self.capacity, self.error_rate,
+                             self.count))
+        fp.write(self.bits)
+
+    @classmethod
+    def load(cls, fp):
+        """Read a filter written by :meth:`dump`"""
+        capacity, error_rate, count = struct.unpack('<QdQ', fp.read(24))
+        rv = cls(capacity, error_rate)
+        rv.bits = bytearray(fp.read())
+        rv.count = count
+        return rv
+
+
+class Crawler(object):
+    """Crawl the entities of a source from the seeds.
+
+    :param source: the source to crawl
+    :param directory: the directory of the checkpoint, not checkpointed if
+        None
+    :param follow: the entity types to follow, from playlist, album and
+        artist
+    :param max_workers: the number of threads fetching entities
+    :param checkpoint_interval: the seconds between checkpoints
+    :param retries: the times to retry an entity failed to fetch
+    :param capacity: the number of entities expected, to size the visited
+        filter
+    """
+    FRONTIER_FILE = 'frontier.json'
+    VISITED_FILE = 'visited.bloom'
+
+    def __init__(self, source, directory=None,
+                 follow=('playlist', 'album', 'artist'), max_workers=8,
+                 checkpoint_interval=30, retries=2, capacity=1000000):
+        self.source = source
+        self.directory = directory
+        self.follow = frozenset(follow)
+        self.max_workers = max_workers
+        self.checkpoint_interval = checkpoint_interval
+        self.retries = retries
+        self.frontier = deque()
+        self.visited = BloomFilter(capacity)
+        #: The entities failed to fetch, as (type, key, error) tuples
+        self.failed = []
+        self.fetched = 0
+        self._attempts = {}
+        #: Whether the state is restored from a checkpoint
+        self.resumed = False
+        if directory is not None:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            self.restore()
+
+    def _name(self, type, key):
+        return '%s:%s:%s' % (self.source.name, type, key)
+
+    def add(self, type, key):
+        """Add an entity to the frontier unless it is visited, return True
+        if it is added.
+        """
+        if type not in self.follow or not key:
+            return False
+        if not self.visited.add(self._name(type, key)):
+            return False
+        self.frontier.append((type, key))
+        return True
+
+    def seed_hub(self, maxpage=None, **kwargs):
+        """Add the playlists of the playlist hub to the frontier, see
+        ``get_playlists`` of the source. Nothing is done when resumed.
+        """
+        if self.resumed:
+            return
+        for page in self.source.get_playlists(maxpage, **kwargs):
+            for playlist in page:
+                self.add('playlist', playlist.id)
+
+    def fetch(self, type, key):
+        """Fetch an entity with the related models loaded"""
+        obj = getattr(self.source, 'get_' + type)(key)
+        if type == 'artist':
+            obj.hot_albums
+        elif type == 'album':
+            obj.songs
+        return obj
+
+    def expand(self, obj):
+        """Add the entities related to a fetched one to the frontier"""
+        identify = self.source.get_identifier
+        if type(obj).__name__ == 'Artist':
+            for album in obj.hot_albums or ():
+                self.add('album', identify(album))
+            return
+        artists = []
+        if getattr(obj, 'artist', None) is not None:
+            artists.append(obj.artist)
+        for song in getattr(obj, 'songs', None) or ():
+            album = getattr(song, 'album', None)
+            if album is not None:
+                self.add('album', identify(album))
+            if getattr(song, 'artist', None) is not None:
+                artists.append(song.artist)
+        for artist in artists:
+            self.add('artist', identify(artist))
+
+    def crawl(self, maxitems=None):
+        """Fetch the entities in the frontier and yield them as they are
+        fetched, until the frontier is empty or ``maxitems`` are yielded.
+        """
+        count = 0
+        running = {}
+        last_checkpoint = time.time()
+        executor = ThreadPoolExecutor(self.max_workers)
+        try:
+            while self.frontier or running:
+                while self.frontier and len(running) < self.max_workers and (
+                        maxitems is None or
+                        count + len(running) < maxitems):
+                    node = self.frontier.popleft()
+                    running[executor.submit(self.fetch, *node)] = node
+                if not running:
+                    break
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    node = running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        self._fail(node, error)
+                        continue
+                    obj = future.result()
+                    self.fetched += 1
+                    self.expand(obj)
+                    count += 1
+                    yield obj
+                if (self.directory is not None and time.time() -
+                        last_checkpoint >= self.checkpoint_interval):
+                    self.checkpoint(running.values())
+                    last_checkpoint = time.time()
+        finally:
+            # The entities not yielded are fetched again after resuming
+            for future, node in running.items():
+                future.cancel()
+            if self.directory is not None:
+                self.checkpoint(running.values())
+            executor.shutdown(wait=False)
+
+    def _fail(self, node, error):
+        attempts = self._attempts.get(node, 0) + 1
+        if attempts <= self.retries:
+            self._attempts[node] = attempts
+            self.frontier.append(node)
+        else:
+            self._attempts.pop(node, None)
+            self.failed.append(node + (repr(error),))
+
+    def checkpoint(self, running=()):
+        """Write the frontier, including the running entities, and the
+        visited filter to the directory.
+        """
+        state = {'frontier': list(running) + list(self.frontier),
+                 'failed': self.failed, 'fetched': self.fetched}
+        self._write(self.FRONTIER_FILE, 'w', lambda f: json.dump(state, f))
+        self._write(self.VISITED_FILE, 'wb', self.visited.dump)
+
+    def _write(self, name, mode, write):
+        path = os.path.join(self.directory, name)
+        with open(path + '.tmp', mode) as f:
+            write(f)
+        _replace(path + '.tmp', path)
+
+    def restore(self):
+        """Read the checkpoint in the directory if exists"""
+        frontier_path = os.path.join(self.directory, self.FRONTIER_FILE)
+        visited_path = os.path.join(self.directory, self.VISITED_FILE)
+        if not (os.path.exists(frontier_path) and
+                os.path.exists(visited_path)):
+            return
+        with open(frontier_path) as f:
+            state = json.load(f)
+        with open(visited_path, 'rb') as f:
+            self.visited = BloomFilter.load(f)
+        self.frontier = deque(tuple(node) for node in state['frontier'])
+        self.failed = [tuple(node) for node in state['failed']]
+        self.fetched = state['fetched']
+        self.resumed = True
+
+    @property
+    def stats(self):
+        return {'visited': len(self.visited), 'frontier': len(self.frontier),
+                'fetched': self.fetched, 'failed': len(self.failed)}
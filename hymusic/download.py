@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+"""Streaming and resumable file downloads.
+
+The data is written to ``<filepath>.part`` chunk by chunk and the file is
+renamed to ``filepath`` when completed, so an interrupted download resumes
+from what has been written by a HTTP Range request.
+
+:class:`DownloadManager` downloads many songs with a thread pool.
+"""
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from ._compat import urlparse
+
+CHUNK_SIZE = 64 * 1024
+
+
+def download(session, url, filepath, chunk_size=CHUNK_SIZE, segments=1,
+             progress=None, received=None):
+    """Download the url to the filepath.
+
+    :param session: the requests session to send requests with
+    :param url: the url to download
+    :param filepath: the target file path
+    :param chunk_size: the size of the chunks written to disk
+    :param segments: the number of byte ranges fetched in parallel, the
+        download falls back to one stream if the server doesn't support
+        ranges or the file size is unknown
+    :param progress: a callable called as ``progress(downloaded, total)``
+        after each chunk, ``total`` is None if unknown. ``downloaded``
+        includes the bytes of a resumed download already on disk
+    :param received: a callable called as ``received(length)`` with the
+        length of each chunk received
+    :returns: the filepath
+    """
+    if segments > 1:
+        total = _get_ranged_size(session, url)
+        if total is not None and total >= segments:
+            _download_segments(session, url, filepath, total, segments,
+                               chunk_size, progress, received)
+            return filepath
+    _download_stream(session, url, filepath, chunk_size, progress, received)
+    return filepath
+
+
+def _download_stream(session, url, filepath, chunk_size, progress,
+                     received):
+    partpath = filepath + '.part'
+    offset = _get_size(partpath)
+    headers = {'Range': 'bytes=%d-' % offset} if offset else {}
+    r = session.get(url, headers=headers, stream=True)
+    try:
+        if offset and r.status_code == 416:
+            # The part file is already complete
+            _finish(partpath, filepath)
+            return
+        r.raise_for_status()
+        if offset and r.status_code != 206:
+            # Range is ignored by the server, start over.
+            offset = 0
+        total = r.headers.get('Content-Length')
+        if total is not None:
+            total = int(total) + offset
+        with open(partpath, 'ab' if offset else 'wb') as f:
+            for chunk in r.iter_content(chunk_size):
+                f.write(chunk)
+                offset += len(chunk)
+                if received is not None:
+                    received(len(chunk))
+                if progress is not None:
+                    progress(offset, total)
+    finally:
+        r.close()
+    if total is not None and offset < total:
+        raise IOError('Incomplete download of %s: %d of %d bytes'
+                      % (url, offset, total))
+    _finish(partpath, filepath)
+
+
+def _download_segments(session, url, filepath, total, segments, chunk_size,
+                       progress, received):
+    size = total // segments
+    ranges = [(i * size, total - 1 if i == segments - 1 else
+               (i + 1) * size - 1) for i in range(segments)]
+    partpath = filepath + '.part'
+    seg_paths = ['%s%d' % (partpath, i) for i in range(segments)]
+    lock = threading.Lock()
+    state = {'downloaded': sum(_get_size(p) for p in seg_paths)}
+
+    def on_chunk(length):
+        with lock:
+            state['downloaded'] += length
+            downloaded = state['downloaded']
+        if received is not None:
+            received(length)
+        if progress is not None:
+            progress(downloaded, total)
+
+    def fetch(args):
+        (start, end), path = args
+        _download_range(session, url, path, start, end, chunk_size, on_chunk)
+
+    with ThreadPoolExecutor(segments) as executor:
+        list(executor.map(fetch, zip(ranges, seg_paths)))
+
+    with open(partpath, 'wb') as f:
+        for path in seg_paths:
+            with open(path, 'rb') as seg:
+                shutil.copyfileobj(seg, f, chunk_size)
+    for path in seg_paths:
+        os.remove(path)
+    _finish(partpath, filepath)
+
+
+def _download_range(session, url, path, start, end, chunk_size, on_chunk):
+    offset = _get_size(path)
+    if start + offset > end:
+        return
+    headers = {'Range': 'bytes=%d-%d' % (start + offset, end)}
+    r = session.get(url, headers=headers, stream=True)
+    try:
+        r.raise_for_status()
+        if r.status_code != 206:
+            raise IOError('Server does not support range requests: %s' % url)
+        with open(path, 'ab') as f:
+            for chunk in r.iter_content(chunk_size):
+                f.write(chunk)
+                on_chunk(len(chunk))
+    finally:
+        r.close()
+
+
+def _get_ranged_size(session, url):
+    """Return the content length if the server accepts byte ranges"""
+    r = session.head(url, allow_redirects=True)
+    if not r.ok or r.headers.get('Accept-Ranges') != 'bytes':
+        return None
+    length = r.headers.get('Content-Length')
+    return int(length) if length is not None else None
+
+
+def _get_size(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def _finish(partpath, filepath):
+    if os.path.exists(filepath):
+        os.remove(filepath)
+    os.rename(partpath, filepath)
+
+
+class DownloadManager(object):
+    """Download songs with a pool of threads, limiting the concurrent
+    downloads per host and retrying failed downloads with exponential
+    backoff. Retried downloads resume from the part files.
+
+    :param directory: the directory to save the songs to
+    :param filename: the format string of file names, formatted with
+        ``song``
+    :param quality: the song quality passed to ``get_song_url``
+    :param max_workers: the max number of concurrent downloads
+    :param max_per_host: the max number of concurrent downloads per host
+    :param retries: the max number of retries of a song
+    :param backoff: the seconds to wait before the first retry, doubled
+        on every retry
+    :param segments: the number of byte ranges per download
+    :param on_progress: called as ``on_progress(song, downloaded, total,
+        throughput)`` where throughput is the overall bytes per second
+    :param on_complete: called as ``on_complete(song, filepath)``
+    :param on_error: called as ``on_error(song, exc)`` when a song failed
+        after all retries
+    :param resolve_url: a callable returning the url of a song, default
+        to the ``get_song_urls`` of the song source for all songs at once
+        if it has one, or else its ``get_song_url``
+    :param session: the session to download with, default to the session
+        of the song source
+    """
+    def __init__(self, directory='.', filename='{song.id}.mp3',
+                 quality='high', max_workers=8, max_per_host=4, retries=3,
+                 backoff=1.0, segments=1, on_progress=None, on_complete=None,
+                 on_error=None, resolve_url=None, session=None):
+        self.directory = directory
+        self.filename = filename
+        self.quality = quality
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.segments = segments
+        self.on_progress = on_progress
+        self.on_complete = on_complete
+        self.on_error = on_error
+        self.resolve_url = resolve_url
+        self.session = session
+        self._lock = threading.Lock()
+        self._host_slots = {}
+        self.bytes_downloaded = 0
+        self.started_at = None
+
+    @property
+    def throughput(self):
+        """The bytes downloaded per second since started"""
+        if self.started_at is None:
+            return 0.0
+        elapsed = time.time() - self.started_at
+        return self.bytes_downloaded / elapsed if elapsed > 0 else 0.0
+
+    def download(self, songs):
+        """Download songs.
+
+        :param songs: an iterable of songs, or a playlist or album
+        :returns: a tuple of the list of ``(song, filepath)`` completed and
+            the list of ``(song, exception)`` failed
+        """
+        songs = list(getattr(songs, 'songs', songs))
+        if self.started_at is None:
+            self.started_at = time.time()
+        urls = self._resolve_urls(songs)
+        completed, failed = [], []
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            futures = []
+            for song in songs:
+                url = urls.get((id(song.source), song.id))
+                futures.append((song, executor.submit(self._download_song,
+                                                      song, url)))
+            for song, future in futures:
+                try:
+                    completed.append((song, future.result()))
+                except Exception as e:
+                    failed.append((song, e))
+        return completed, failed
+
+    def _download_song(self, song, url=None):
+        filepath = os.path.join(self.directory, self.get_filename(song))
+        session = self.session or song.source.session
+
+        def received(length):
+            with self._lock:
+                self.bytes_downloaded += length
+
+        def progress(current, total):
+            if self.on_progress is not None:
+                self.on_progress(song, current, total, self.throughput)
+
+        attempt = 0
+        while True:
+            try:
+                if url is None:
+                    url = self._resolve_url(song)
+                with self._get_host_slot(url):
+                    download(session, url, filepath, segments=self.segments,
+                             progress=progress, received=received)
+                break
+            except (requests.RequestException, IOError) as e:
+                if attempt >= self.retries:
+                    if self.on_error is not None:
+                        self.on_error(song, e)
+                    raise
+                time.sleep(self.backoff * 2 ** attempt)
+                attempt += 1
+                response = getattr(e, 'response', None)
+                if response is not None and 400 <= response.status_code < 500:
+                    # The url may have expired, resolve it again
+                    url = None
+        if self.on_complete is not None:
+            self.on_complete(song, filepath)
+        return filepath
+
+    def get_filename(self, song):
+        name = self.filename.format(song=song)
+        return name.replace('/', '_').replace(os.sep, '_')
+
+    def _resolve_urls(self, songs):
+        """Resolve the urls of the songs in batches for the sources having
+        ``get_song_urls``, return a dict mapping ``(id(source), song id)``
+        to urls. The other songs are resolved one by one when downloaded.
+        """
+        rv = {}
+        if self.resolve_url is not None:
+            return rv
+        sources = {}
+        for song in songs:
+            if hasattr(song.source, 'get_song_urls'):
+                sources.setdefault(id(song.source), (song.source, []))[1] \
+                    .append(song.id)
+        for key, (source, ids) in sources.items():
+            try:
+                urls, _ = source.get_song_urls(ids, self.quality)
+            except requests.RequestException:
+                continue
+            for song_id, url in urls.items():
+                rv[(key, song_id)] = url
+        return rv
+
+    def _resolve_url(self, song):
+        if self.resolve_url is not None:
+            return self.resolve_url(song)
+        return song.source.get_song_url(song.id, self.quality)
+
+    def _get_host_slot(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(
+                    self.max_per_host)
+            return self._host_slots[host]
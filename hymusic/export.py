@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""Streaming export of models to NDJSON and Arrow/Parquet.
+
+The models are flattened to rows with a fixed schema per model type, where
+the referenced models are replaced by their ids. The input can be any
+iterable of models or of lists of models, such as the pages yielded by
+``get_playlists``, and is written incrementally::
+
+    with open('playlists.ndjson', 'w') as f:
+        export_ndjson(netease.get_playlists(maxpage=100), f)
+    export_arrow(netease.get_playlists(maxpage=100), 'out/')
+"""
+import os
+
+from ._compat import json, string_types
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _str(value):
+    if value is None or isinstance(value, string_types):
+        return value
+    return str(value)
+
+
+def _ref(attr, field):
+    def get(obj):
+        return getattr(getattr(obj, attr, None), field, None)
+    return get
+
+
+def _song_ids(obj):
+    # Only the loaded songs, don't trigger requests
+    songs = getattr(obj, '_songs', None)
+    if songs is None:
+        return None
+    return [_int(song.id) for song in songs]
+
+
+#: The columns of each model type, as (name, arrow type name, getter,
+#: converter) where getter is the attribute name or a callable
+SCHEMAS = {
+    'song': [('id', 'int64', 'id', _int),
+             ('mid', 'string', 'mid', _str),
+             ('name', 'string', 'name', _str),
+             ('duration', 'float64', 'duration', _float),
+             ('publish_time', 'string', 'publish_time', _str),
+             ('album_id', 'int64', _ref('album', 'id'), _int),
+             ('album_mid', 'string', _ref('album', 'mid'), _str),
+             ('artist_id', 'int64', _ref('artist', 'id'), _int),
+             ('artist_mid', 'string', _ref('artist', 'mid'), _str)],
+    'album': [('id', 'int64', 'id', _int),
+              ('mid', 'string', 'mid', _str),
+              ('name', 'string', 'name', _str),
+              ('company', 'string', 'company', _str),
+              ('cover_url', 'string', 'cover_url', _str),
+              ('publish_time', 'string', 'publish_time', _str),
+              ('artist_id', 'int64', _ref('artist', 'id'), _int),
+              ('artist_mid', 'string', _ref('artist', 'mid'), _str)],
+    'artist': [('id', 'int64', 'id', _int),
+               ('mid', 'string', 'mid', _str),
+               ('name', 'string', 'name', _str),
+               ('cover_url', 'string', 'cover_url', _str)],
+    'playlist': [('id', 'int64', 'id', _int),
+                 ('name', 'string', 'name', _str),
+                 ('cover_url', 'string', 'cover_url', _str),
+                 ('song_count', 'int64', '_song_count', _int),
+                 ('play_count', 'int64', '_play_count', _int),
+                 ('book_count', 'int64', 'book_count', _int),
+                 ('shared_count', 'int64', 'shared_count', _int),
+                 ('creator_id', 'int64', _ref('creator', 'id'), _int),
+                 ('song_ids', 'list<int64>', _song_ids, None)],
+    'user': [('id', 'int64', 'id', _int),
+             ('name', 'string', 'name', _str),
+             ('gender', 'string', 'gender', _str),
+             ('avatar_url', 'string', 'avatar_url', _str),
+             ('signature', 'string', 'signature', _str)],
+}
+
+
+def iter_models(items):
+    """Flatten an iterable of models and lists of models"""
+    for item in items:
+        if isinstance(item, (list, tuple)):
+            for obj in item:
+                yield obj
+        else:
+            yield item
+
+
+def to_row(obj):
+    """Flatten a model to a dict with the columns of its type, the lazy
+    fields not loaded are None.
+    """
+    type_name = type(obj).__name__.lower()
+    row = {'source': obj.source.name if obj.source is not None else None}
+    for name, _, getter, convert in SCHEMAS[type_name]:
+        if callable(getter):
+            value = getter(obj)
+        else:
+            value = getattr(obj, getter, None)
+        row[name] = convert(value) if convert is not None else value
+    return row
+
+
+def export_ndjson(items, fp):
+    """Write the models as newline delimited JSON to a text file, with a
+    ``type`` field in each record.
+
+    :returns: the number of models written
+    """
+    count = 0
+    for obj in iter_models(items):
+        row = to_row(obj)
+        row['type'] = type(obj).__name__.lower()
+        fp.write(json.dumps(row, ensure_ascii=False))
+        fp.write(u'\n')
+        count += 1
+    return count
+
+
+def arrow_schema(type_name):
+    """Return the pyarrow schema of a model type"""
+    types = {'int64': pyarrow.int64(), 'float64': pyarrow.float64(),
+             'string': pyarrow.string(),
+             'list<int64>': pyarrow.list_(pyarrow.int64())}
+    fields = [pyarrow.field('source', pyarrow.string())]
+    fields.extend(pyarrow.field(name, types[arrow_type])
+                  for name, arrow_type, _, _ in SCHEMAS[type_name])
+    return pyarrow.schema(fields)
+
+
+class ArrowWriter(object):
+    """Write the models to one file per model type in the directory, as
+    record batches of ``batch_size`` rows, so at most one batch per type
+    is held in memory.
+
+    :param directory: the directory to write ``<type>.parquet`` or
+        ``<type>.arrow`` files to
+    :param format: parquet or arrow (the Arrow IPC file format)
+    :param batch_size: the number of rows in a record batch
+    """
+    def __init__(self, directory, format='parquet', batch_size=10000):
+        if pyarrow is None:
+            raise RuntimeError('pyarrow is required to export to %s' % format)
+        if format not in ('parquet', 'arrow'):
+            raise ValueError('Unknown format "%s"' % format)
+        self.directory = directory
+        self.format = format
+        self.batch_size = batch_size
+        self._rows = {}
+        self._writers = {}
+
+    def write(self, items):
+        count = 0
+        for obj in iter_models(items):
+            type_name = type(obj).__name__.lower()
+            rows = self._rows.setdefault(type_name, [])
+            rows.append(to_row(obj))
+            if len(rows) >= self.batch_size:
+                self._write_batch(type_name)
+            count += 1
+        return count
+
+    def _write_batch(self, type_name):
+        rows = self._rows.pop(type_name, None)
+        if not rows:
+            return
+        schema = arrow_schema(type_name)
+        columns = [[row[name] for row in rows] for name in schema.names]
+        batch = pyarrow.RecordBatch.from_arrays(
+            [pyarrow.array(column, type=field.type)
+             for column, field in zip(columns, schema)], schema=schema)
+        writer = self._writers.get(type_name)
+        if writer is None:
+            path = os.path.join(self.directory,
+                                '%s.%s' % (type_name, self.format))
+            if self.format == 'parquet':
+                writer = pyarrow.parquet.ParquetWriter(path, schema)
+            else:
+                writer = pyarrow.ipc.new_file(path, schema)
+            self._writers[type_name] = writer
+        if self.format == 'parquet':
+            writer.write_table(pyarrow.Table.from_batches([batch]))
+        else:
+            writer.write_batch(batch)
+
+    def close(self):
+        for type_name in list(self._rows):
+            self._write_batch(type_name)
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def export_arrow(items, directory, format='parquet', batch_size=10000):
+    """Write the models to Parquet or Arrow files in the directory, see
+    :class:`ArrowWriter`.
+
+    :returns: the number of models written
+    """
+    with ArrowWriter(directory, format, batch_size) as writer:
+        return writer.write(items)
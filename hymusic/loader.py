@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Batched resolution of lazy properties.
+
+Accessing a lazy property such as ``artist.hot_albums`` sends a request
+right away, so iterating over many objects sends the requests one by one.
+A :class:`Loader` collects the pending loads instead and resolves them
+concurrently, sending one request per distinct entity::
+
+    with Loader() as loader:
+        for artist in artists:
+            loader.load(artist, 'hot_albums')
+    # All hot_albums are loaded here
+    albums = [a.hot_albums for a in artists]
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+def is_loaded(obj, name):
+    """Check if the lazy property of the object has been loaded"""
+    prop = getattr(type(obj), name)
+    return hasattr(obj, prop.attr)
+
+
+class Loader(object):
+    """Collect lazy property loads and resolve them at once, when
+    :meth:`dispatch` is called or the ``with`` block exits.
+
+    :param max_workers: the max number of concurrent requests
+    """
+    def __init__(self, max_workers=8):
+        self.max_workers = max_workers
+        self._pending = OrderedDict()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def load(self, obj, name):
+        """Queue the load of a lazy property unless it is loaded already.
+        The objects of the same entity are loaded by one request, for all
+        the properties filled by the same request such as ``Model.parse``.
+        """
+        if is_loaded(obj, name):
+            return
+        source = obj.source
+        key = (id(source), type(obj).__name__, source.get_identifier(obj))
+        getters, objs = self._pending.setdefault(key, (OrderedDict(), []))
+        getters.setdefault(getattr(type(obj), name).getter, name)
+        objs.append(obj)
+
+    def load_many(self, objs, name):
+        for obj in objs:
+            self.load(obj, name)
+
+    def dispatch(self):
+        """Resolve all pending loads concurrently"""
+        pending, self._pending = self._pending, OrderedDict()
+        if not pending:
+            return
+        workers = min(self.max_workers, len(pending))
+        with ThreadPoolExecutor(workers) as executor:
+            list(executor.map(self._resolve, pending.values()))
+
+    @staticmethod
+    def _resolve(item):
+        getters, objs = item
+        first = objs[0]
+        for name in getters.values():
+            getattr(first, name)
+        for obj in objs[1:]:
+            if obj is not first:
+                obj.update(first)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self.dispatch()
+
+
+def prefetch(objs, name, max_workers=8):
+    """Load a lazy property of the objects concurrently, one request per
+    distinct entity.
+
+    :param objs: the model objects
+    :param name: the name of the lazy property
+    :returns: the list of objects
+    """
+    objs = list(objs)
+    with Loader(max_workers) as loader:
+        loader.load_many(objs, name)
+    return objs
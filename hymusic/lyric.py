@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""Parsed LRC lyrics with time based lookup."""
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+
+_time_tag_re = re.compile(r'\[(\d+):(\d+(?:\.\d+)?)\]')
+
+#: The max difference in milliseconds to align a translated line
+ALIGN_TOLERANCE = 500
+
+
+def parse_lrc(text):
+    """Parse the LRC text to a list of (milliseconds, text) sorted by time.
+    A line with several time tags is repeated at each time, and the lines
+    without time tags, such as the metadata, are skipped.
+    """
+    rv = []
+    for line in (text or u'').splitlines():
+        times = []
+        pos = 0
+        while True:
+            match = _time_tag_re.match(line, pos)
+            if match is None:
+                break
+            times.append(int(round((int(match.group(1)) * 60 +
+                                    float(match.group(2))) * 1000)))
+            pos = match.end()
+        content = line[pos:].strip()
+        for time in times:
+            rv.append((time, content))
+    rv.sort(key=lambda item: item[0])
+    return rv
+
+
+class Lyric(object):
+    """A parsed lyric, whose line times in milliseconds are stored in a
+    sorted array for binary search, with the translations aligned to the
+    lines.
+
+    :param times: the sorted line times in milliseconds
+    :param texts: the line texts
+    :param translations: the translated line texts or None
+    """
+    __slots__ = ('times', 'texts', 'translations')
+
+    def __init__(self, times, texts, translations=None):
+        self.times = array('l', times)
+        self.texts = tuple(texts)
+        self.translations = tuple(translations) if translations else None
+
+    @classmethod
+    def parse(cls, lyric, tlyric=None):
+        """Parse the LRC lyric and merge the translation by timestamps.
+        A translated line is aligned to the line of the same time, or the
+        nearest one within :data:`ALIGN_TOLERANCE`.
+        """
+        lines = parse_lrc(lyric)
+        times = [time for time, _ in lines]
+        translated = parse_lrc(tlyric) if tlyric else []
+        translations = None
+        if translated:
+            translations = [u''] * len(lines)
+            for time, text in translated:
+                i = _nearest(times, time)
+                if i is not None and not translations[i]:
+                    translations[i] = text
+        return cls(times, [text for _, text in lines], translations)
+
+    def __len__(self):
+        return len(self.times)
+
+    def __iter__(self):
+        """Iterate (milliseconds, text, translation) of the lines"""
+        for i in range(len(self.times)):
+            yield self[i]
+
+    def __getitem__(self, i):
+        translation = self.translations[i] if self.translations else None
+        return self.times[i], self.texts[i], translation
+
+    def __repr__(self):
+        return '<Lyric: %d lines>' % len(self)
+
+    def index_at(self, seconds):
+        """Return the index of the line shown at the time in seconds, or
+        -1 if it is before the first line.
+        """
+        return bisect_right(self.times, int(seconds * 1000)) - 1
+
+    def line_at(self, seconds):
+        """Return (milliseconds, text, translation) of the line shown at the
+        time in seconds, or None if it is before the first line.
+        """
+        i = self.index_at(seconds)
+        return self[i] if i >= 0 else None
+
+
+def _nearest(times, time):
+    i = bisect_left(times, time)
+    candidates = [j for j in (i - 1, i) if 0 <= j < len(times)]
+    if not candidates:
+        return None
+    j = min(candidates, key=lambda j: abs(times[j] - time))
+    if abs(times[j] - time) > ALIGN_TOLERANCE:
+        return None
+    return j
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""Per-endpoint request metrics of the sources.
+
+The latencies are recorded in histograms split into the network, JSON
+decoding and model building phases::
+
+    metrics = Metrics()
+    source = NeteaseCloud(metrics=metrics)
+    source.search('hello')
+    metrics.snapshot()
+    print(metrics.to_prometheus())
+"""
+import functools
+import threading
+import time
+
+#: The endpoint label of the requests matching no endpoint, such as the
+#: downloads
+OTHER = 'other'
+
+#: The upper bounds in seconds of the histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PHASES = ('network', 'decode', 'build')
+
+
+class Histogram(object):
+    """A histogram of the observed values with fixed bucket bounds"""
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self):
+        return {'buckets': dict(zip(self.buckets + (float('inf'),),
+                                    self.counts)),
+                'sum': self.sum, 'count': self.count}
+
+
+class EndpointMetrics(object):
+    def __init__(self, buckets=BUCKETS):
+        self.requests = 0
+        self.errors = 0
+        self.bytes = 0
+        self.phases = dict((phase, Histogram(buckets)) for phase in PHASES)
+
+    def to_dict(self):
+        rv = {'requests': self.requests, 'errors': self.errors,
+              'bytes': self.bytes}
+        for phase, histogram in self.phases.items():
+            rv[phase] = histogram.to_dict()
+        return rv
+
+
+class Metrics(object):
+    """Collect the request metrics of source sessions, by the request hooks
+    of :class:`~hymusic.session.Session`.
+
+    :param buckets: the upper bounds of the latency histogram buckets
+    """
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._endpoints = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def attach(self, session):
+        """Record the requests sent by the session"""
+        def after_request(method, url, response, elapsed, error):
+            endpoint = session.match_endpoint(url) or OTHER
+            size = 0
+            failed = response is None or response.status_code >= 400
+            if response is not None:
+                size = int(response.headers.get('Content-Length') or 0)
+                if response._content_consumed:
+                    size = len(response.content)
+                self._instrument_json(endpoint, response)
+            with self._lock:
+                metrics = self._get(endpoint)
+                metrics.requests += 1
+                metrics.errors += failed
+                metrics.bytes += size
+                metrics.phases['network'].observe(elapsed)
+
+        session.after_request.append(after_request)
+
+    def _get(self, endpoint):
+        if endpoint not in self._endpoints:
+            self._endpoints[endpoint] = EndpointMetrics(self.buckets)
+        return self._endpoints[endpoint]
+
+    def observe(self, endpoint, phase, seconds):
+        with self._lock:
+            self._get(endpoint).phases[phase].observe(seconds)
+
+    def _instrument_json(self, endpoint, response):
+        decode = response.json
+
+        @functools.wraps(decode)
+        def json(**kwargs):
+            start = time.time()
+            try:
+                return decode(**kwargs)
+            finally:
+                self.observe(endpoint, 'decode', time.time() - start)
+
+        response.json = json
+
+    def time_build(self, endpoint, builder, *args, **kwargs):
+        """Call the builder and record the time in the build phase of the
+        endpoint. Nested builds are counted in the outermost one.
+
+        :param endpoint: the endpoint of the built response, None for
+            :data:`OTHER`
+        """
+        local = self._local
+        depth = getattr(local, 'depth', 0)
+        if depth:
+            return builder(*args, **kwargs)
+        local.depth = 1
+        start = time.time()
+        try:
+            return builder(*args, **kwargs)
+        finally:
+            local.depth = 0
+            self.observe(endpoint or OTHER, 'build', time.time() - start)
+
+    def snapshot(self):
+        """Return the metrics as a dict keyed by endpoint urls, and
+        :data:`OTHER` for the requests matching no endpoint.
+        """
+        with self._lock:
+            return dict((endpoint, metrics.to_dict())
+                        for endpoint, metrics in self._endpoints.items())
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def to_prometheus(self, prefix='hymusic'):
+        """Export the metrics in the Prometheus text format"""
+        snapshot = self.snapshot()
+        lines = []
+        for name, key in (('requests_total', 'requests'),
+                          ('request_errors_total', 'errors'),
+                          ('response_bytes_total', 'bytes')):
+            lines.append('# TYPE %s_%s counter' % (prefix, name))
+            for endpoint in sorted(snapshot):
+                lines.append('%s_%s{endpoint="%s"} %d' % (
+                    prefix, name, endpoint, snapshot[endpoint][key]))
+        name = '%s_phase_seconds' % prefix
+        lines.append('# TYPE %s histogram' % name)
+        for endpoint in sorted(snapshot):
+            for phase in PHASES:
+                histogram = snapshot[endpoint][phase]
+                labels = 'endpoint="%s",phase="%s"' % (endpoint, phase)
+                cumulative = 0
+                for bound in self.buckets + (float('inf'),):
+                    cumulative += histogram['buckets'][bound]
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append('%s_bucket{%s,le="%s"} %d' % (
+                        name, labels, le, cumulative))
+                lines.append('%s_sum{%s} %r' % (name, labels,
+                                                histogram['sum']))
+                lines.append('%s_count{%s} %d' % (name, labels,
+                                                  histogram['count']))
+        return '\n'.join(lines) + '\n'
+
+
+def instrumented(builder):
+    """Decorate a ``_build_*_from_json`` method to record its time when the
+    source has metrics enabled, in the endpoint of the last request made in
+    this thread.
+    """
+    @functools.wraps(builder)
+    def wrapper(self, *args, **kwargs):
+        if self.metrics is None:
+            return builder(self, *args, **kwargs)
+        return self.metrics.time_build(self.session.current_endpoint,
+                                       builder, self, *args, **kwargs)
+    return wrapper
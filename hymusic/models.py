@@ -1,16 +1,81 @@
 # -*- coding: utf-8 -*-
 """The ORM models for musicbox objects mapping"""
 from __future__ import unicode_literals
-from .utils import lazy_property, build_date
+from .utils import lazy_property, build_date, LazyList
+from .download import download
+
+
+def declare_fields(*fields, **kwargs):
+    """Return the ``__slots__`` of a model class for the given fields and
+    the lazy fields given by ``lazy``, whose values are stored in the
+    attributes with a leading underscore.
+    """
+    return fields + tuple('_' + name for name in kwargs.get('lazy', ()))
 
 
 class Model(object):
+    __slots__ = ('source', '__weakref__')
+
+    #: The fields referencing other models, mapping to the class names
+    references = {}
+
+    _slot_names = {}
+
     def __init__(self, source, **kwargs):
         self.source = source
         for k, v in kwargs.items():
             if v is not None:
                 setattr(self, k, v)
 
+    @classmethod
+    def get_slot_names(cls):
+        """Return the names of all data slots of the class"""
+        try:
+            return Model._slot_names[cls]
+        except KeyError:
+            names = []
+            for klass in reversed(cls.__mro__):
+                for name in klass.__dict__.get('__slots__', ()):
+                    if name not in ('source', '__weakref__'):
+                        names.append(name)
+            Model._slot_names[cls] = names = tuple(names)
+            return names
+
+    def update(self, other):
+        """Copy the loaded fields of another object of the same type"""
+        for name in self.get_slot_names():
+            try:
+                setattr(self, name, getattr(other, name))
+            except AttributeError:
+                pass
+
+    def to_dict(self):
+        """Return the loaded fields as a dict. The referenced models are
+        converted to dicts too, and the lists of models are left out.
+        """
+        rv = {}
+        for name in self.get_slot_names():
+            try:
+                value = getattr(self, name)
+            except AttributeError:
+                continue
+            if isinstance(value, Model):
+                value = value.to_dict()
+            elif isinstance(value, (list, LazyList)):
+                continue
+            rv[name.lstrip('_')] = value
+        return rv
+
+    @classmethod
+    def from_dict(cls, source, data):
+        """Build an object bound to the source from :meth:`to_dict` data"""
+        fields = {}
+        for k, v in data.items():
+            if k in cls.references and isinstance(v, dict):
+                v = globals()[cls.references[k]].from_dict(source, v)
+            fields[k] = v
+        return cls(source, **fields)
+
     def match_fields(self, fields):
         """Check if the object match the fields restrictions.
         Only check if the corresponding attribute's name matches.
@@ -28,44 +93,61 @@ class Model(object):
 
 
 class Album(Model):
+    __slots__ = declare_fields('id', 'mid', 'name', 'artist', 'company',
+                               'cover_url', 'publish_time', lazy=('songs',))
+    references = {'artist': 'Artist'}
 
     def __repr__(self):
         return '<Album(%d): %s - %s>' % (self.id, self.name, self.artist.name)
 
     songs = lazy_property(Model.parse, 'songs')
-    cover_url = lazy_property(Model, 'cover_url')
 
 
 class Artist(Model):
+    __slots__ = declare_fields('id', 'mid', 'name', 'cover_url',
+                               lazy=('hot_albums',))
 
     def __repr__(self):
         return '<Artist(%d): %s>' % (self.id, self.name)
 
     hot_albums = lazy_property(Model.parse, 'hot_albums')
-    cover_url = lazy_property(Model, 'cover_url')
 
 
 class Song(Model):
+    __slots__ = declare_fields('id', 'mid', 'name', 'duration',
+                               'publish_time', 'album', 'artist',
+                               lazy=('comment_count',))
+    references = {'artist': 'Artist', 'album': 'Album'}
 
     def __repr__(self):
         return '<Song(%d): %s - %s>' % (self.id,
                                         self.name, self.artist.name)
 
-    def download(self, filepath, quality='high'):
+    def download(self, filepath, quality='high', segments=1, progress=None):
+        """Download the song to the filepath, see
+        :func:`hymusic.download.download`.
+        """
         url = self.source.get_song_url(self.id, quality)
-        with open(filepath, 'wb') as f:
-            f.write(self.source.session.get(url).content)
-        print "Download song successfully to %s" % filepath
+        return download(self.source.session, url, filepath,
+                        segments=segments, progress=progress)
 
     def get_lyric(self, type='lyric'):
         return self.source.get_song_lyric(self.id, type)
 
+    def get_parsed_lyric(self):
+        """Return the :class:`~hymusic.lyric.Lyric` of the song"""
+        return self.source.get_lyric(self.id)
+
     @lazy_property
     def comment_count(self):
         self.comment_count = self.source.get_comment_count(self.mid)
 
 
 class PlayList(Model):
+    __slots__ = declare_fields('id', 'name', 'cover_url', 'creator',
+                               'book_count', 'shared_count',
+                               lazy=('songs', 'song_count', 'play_count'))
+    references = {'creator': 'User'}
 
     def __repr__(self):
         return '<Playlist(%d): %s>' % (self.id, self.name)
@@ -76,6 +158,8 @@ class PlayList(Model):
 
 
 class User(Model):
+    __slots__ = declare_fields('id', 'name', 'gender', 'avatar_url',
+                               'signature')
 
     def __repr__(self):
         return '<User(%d): %s' % (self.id, self.name)
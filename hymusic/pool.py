@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""A HTTP adapter with a tunable connection pool which counts the
+connections opened and reused. One adapter may be shared by several
+sources, and is safe to use from many threads::
+
+    pool = PoolAdapter(pool_maxsize=32, pool_block=True)
+    netease = NeteaseCloud(pool=pool)
+    qqmusic = QQMusic(pool=pool)
+    ...
+    pool.stats  # {'requests': 120, 'opened': 8, 'reused': 112, ...}
+"""
+import threading
+
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+def _counting_pool(pool_cls, adapter):
+    class CountingPool(pool_cls):
+        def _get_conn(self, timeout=None):
+            conn = super(CountingPool, self)._get_conn(timeout)
+            # The dropped connections are closed by the pool, so a
+            # connection without socket will connect again
+            adapter._count(getattr(conn, 'sock', None) is None)
+            return conn
+
+    CountingPool.__name__ = pool_cls.__name__
+    return CountingPool
+
+
+class PoolAdapter(HTTPAdapter):
+    """A HTTP adapter keeping the connections to each host in a pool.
+
+    :param pool_connections: the number of host pools to keep
+    :param pool_maxsize: the max number of idle connections kept per host,
+        it should be at least the number of threads sending requests
+    :param pool_block: whether to wait for a free connection when
+        ``pool_maxsize`` connections to the host are in use, instead of
+        opening a new one which is closed after use
+    :param keep_alive: whether to reuse the connections, if False every
+        request is sent with ``Connection: close``
+    :param max_retries: the number of retries of failed connections
+    """
+    __attrs__ = HTTPAdapter.__attrs__ + ['keep_alive']
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, pool_block=False,
+                 keep_alive=True, max_retries=0):
+        self.keep_alive = keep_alive
+        self.counts = {'requests': 0, 'opened': 0}
+        self._lock = threading.Lock()
+        super(PoolAdapter, self).__init__(pool_connections, pool_maxsize,
+                                          max_retries, pool_block)
+
+    def __setstate__(self, state):
+        self.counts = {'requests': 0, 'opened': 0}
+        self._lock = threading.Lock()
+        super(PoolAdapter, self).__setstate__(state)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(PoolAdapter, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _counting_pool(HTTPConnectionPool, self),
+            'https': _counting_pool(HTTPSConnectionPool, self)}
+
+    def grow(self, pool_maxsize):
+        """Keep at least ``pool_maxsize`` idle connections per host. The
+        host pools are replaced if they are smaller, closing their idle
+        connections.
+        """
+        if pool_maxsize <= self._pool_maxsize:
+            return
+        old = self.poolmanager
+        self._pool_maxsize = pool_maxsize
+        self.init_poolmanager(self._pool_connections, pool_maxsize,
+                              block=self._pool_block)
+        old.clear()
+
+    def add_headers(self, request, **kwargs):
+        if not self.keep_alive:
+            request.headers['Connection'] = 'close'
+
+    def _count(self, opened):
+        with self._lock:
+            self.counts['requests'] += 1
+            if opened:
+                self.counts['opened'] += 1
+
+    @property
+    def stats(self):
+        """The number of connections checked out for requests, opened and
+        reused, and the idle connections in the live host pools.
+        """
+        pools = self.poolmanager.pools
+        idle = 0
+        with pools.lock:
+            for key in pools.keys():
+                queue = pools[key].pool
+                if queue is not None:
+                    idle += sum(1 for conn in list(queue.queue)
+                                if conn is not None)
+        with self._lock:
+            requests, opened = self.counts['requests'], self.counts['opened']
+        return {'requests': requests, 'opened': opened,
+                'reused': requests - opened, 'pools': len(pools),
+                'idle': idle}
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""Adaptive rate limiting of the source requests.
+
+Each endpoint with a configured rate has its own token bucket and the
+other endpoints share the default one. The rate is halved when the server
+throttles or fails a request and recovers step by step on successes::
+
+    limiter = RateLimiter(rate=10, rates={NeteaseCloud.SEARCH_URL: 2})
+    source = NeteaseCloud(rate_limiter=limiter)
+
+The buckets are thread-safe, so a source can be shared by threads and by
+the asyncio tasks of :class:`hymusic.aio.AsyncSource`.
+"""
+import threading
+import time
+
+#: The status codes taken as throttling
+THROTTLE_STATUS = (429, 503)
+
+
+class TokenBucket(object):
+    """A thread-safe token bucket whose rate adapts to the responses.
+
+    :param rate: the initial and max requests per second
+    :param capacity: the max burst size, default to one second of requests
+    :param min_rate: the rate doesn't back off below this
+    :param backoff: the factor to multiply the rate by on throttling
+    :param increase: the requests per second added to the rate on success
+    """
+    def __init__(self, rate, capacity=None, min_rate=None, backoff=0.5,
+                 increase=None):
+        self.max_rate = self.rate = float(rate)
+        self.capacity = float(capacity or max(rate, 1))
+        self.min_rate = float(min_rate or rate / 20.0)
+        self.backoff = backoff
+        self.increase = increase or self.max_rate / 20.0
+        self.tokens = self.capacity
+        self.paused_until = 0.0
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - max(self._updated, self.paused_until)
+        if elapsed > 0:
+            self.tokens = min(self.capacity,
+                              self.tokens + elapsed * self.rate)
+            self._updated = now
+
+    def acquire(self):
+        """Take a token, blocking until it is available.
+
+        :returns: the seconds waited
+        """
+        with self._lock:
+            now = time.time()
+            self._refill(now)
+            # Reserve the token so that waiters are served in order
+            self.tokens -= 1
+            wait = max(self.paused_until - now, 0)
+            if self.tokens < 0:
+                wait += -self.tokens / self.rate
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def throttled(self, retry_after=None):
+        """Back off the rate, and pause for ``retry_after`` seconds"""
+        with self._lock:
+            now = time.time()
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate * self.backoff)
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+
+    def succeeded(self):
+        """Recover the rate towards the max rate"""
+        if self.rate < self.max_rate:
+            with self._lock:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+
+
+class RateLimiter(object):
+    """Limit the request rate of a source per endpoint.
+
+    :param rate: the max requests per second of the endpoints without
+        a configured rate
+    :param rates: a dict mapping endpoint urls to their max rates
+    :param kwargs: the other arguments of :class:`TokenBucket`
+    """
+    def __init__(self, rate=5, rates=None, **kwargs):
+        self.default = TokenBucket(rate, **kwargs)
+        self.buckets = dict((endpoint, TokenBucket(r, **kwargs))
+                            for endpoint, r in (rates or {}).items())
+        self.requests = self.throttles = 0
+        self.queued_time = 0.0
+        self._lock = threading.Lock()
+
+    def get_bucket(self, endpoint):
+        return self.buckets.get(endpoint, self.default)
+
+    def acquire(self, endpoint):
+        """Wait for the turn to send a request to the endpoint"""
+        waited = self.get_bucket(endpoint).acquire()
+        with self._lock:
+            self.requests += 1
+            self.queued_time += waited
+        return waited
+
+    def feedback(self, endpoint, response=None, error=None):
+        """Adapt the rate of the endpoint to the response or error"""
+        bucket = self.get_bucket(endpoint)
+        if error is not None or response is None or \
+                response.status_code in THROTTLE_STATUS or \
+                response.status_code >= 500:
+            retry_after = None
+            if response is not None:
+                retry_after = _parse_retry_after(
+                    response.headers.get('Retry-After'))
+            bucket.throttled(retry_after)
+            with self._lock:
+                self.throttles += 1
+        else:
+            bucket.succeeded()
+
+    @property
+    def stats(self):
+        return {'rate': self.default.rate,
+                'rates': dict((endpoint, bucket.rate)
+                              for endpoint, bucket in self.buckets.items()),
+                'requests': self.requests,
+                'throttles': self.throttles,
+                'queued_time': self.queued_time}
+
+
+def _parse_retry_after(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""Fail fast on failing endpoints and hedge slow requests.
+
+A :class:`CircuitBreaker` rejects the requests to an endpoint after a run
+of failures, until a trial request succeeds. A :class:`Hedger` sends a
+duplicate of an idempotent request if it is slower than the observed p95
+latency of its endpoint, and returns whichever response arrives first::
+
+    source = QQMusic(breaker=CircuitBreaker(), hedger=Hedger())
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import requests
+
+
+class CircuitOpenError(requests.RequestException):
+    """The request is rejected as the endpoint is failing"""
+
+
+class _Circuit(object):
+    def __init__(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+
+class CircuitBreaker(object):
+    """A thread-safe circuit breaker per endpoint. A request fails if it
+    raises or returns a 5xx status.
+
+    :param threshold: the number of consecutive failures to open the
+        circuit of an endpoint
+    :param reset_timeout: the seconds to reject the requests when open,
+        after which one trial request is let through
+    """
+    def __init__(self, threshold=5, reset_timeout=30):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.rejected = 0
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def before(self, endpoint):
+        """Raise :class:`CircuitOpenError` if the endpoint is open"""
+        with self._lock:
+            circuit = self._circuits.get(endpoint)
+            if circuit is None or circuit.opened_at is None:
+                return
+            if (time.time() - circuit.opened_at < self.reset_timeout or
+                    circuit.trial):
+                self.rejected += 1
+                raise CircuitOpenError('The circuit of %s is open' % endpoint)
+            circuit.trial = True
+
+    def record(self, endpoint, response, error=None):
+        failed = (error is not None or response is None or
+                  response.status_code >= 500)
+        with self._lock:
+            circuit = self._circuits.setdefault(endpoint, _Circuit())
+            if not failed:
+                circuit.failures = 0
+                circuit.opened_at = None
+                circuit.trial = False
+                return
+            circuit.failures += 1
+            if circuit.trial or circuit.failures >= self.threshold:
+                circuit.opened_at = time.time()
+                circuit.trial = False
+
+    def get_state(self, endpoint):
+        """Return closed, open or half-open"""
+        with self._lock:
+            circuit = self._circuits.get(endpoint)
+            if circuit is None or circuit.opened_at is None:
+                return 'closed'
+            if (circuit.trial or
+                    time.time() - circuit.opened_at >= self.reset_timeout):
+                return 'half-open'
+            return 'open'
+
+    @property
+    def stats(self):
+        return {'rejected': self.rejected,
+                'states': dict((endpoint, self.get_state(endpoint))
+                               for endpoint in list(self._circuits))}
+
+
+class Hedger(object):
+    """Hedge the requests to the endpoints with enough observed latencies.
+
+    :param quantile: the quantile of the latencies to wait before hedging
+    :param window: the number of latest latencies kept per endpoint
+    :param min_samples: the number of latencies needed to hedge
+    :param min_delay: the min seconds to wait before hedging
+    :param max_workers: the max number of requests running on the hedger
+        threads, the requests beyond are sent on the calling thread
+        without hedging. It is grown by the sources using the hedger to
+        twice the size of their connection pools, see :meth:`grow`
+    """
+    def __init__(self, quantile=0.95, window=100, min_samples=20,
+                 min_delay=0.01, max_workers=32):
+        self.quantile = quantile
+        self.window = window
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.requests = self.hedged = self.hedge_wins = 0
+        self.max_workers = max_workers
+        self._latencies = {}
+        self._lock = threading.Lock()
+        self._running = 0
+        self._executor = ThreadPoolExecutor(max_workers)
+
+    def grow(self, max_workers):
+        """Run at least ``max_workers`` requests on the hedger threads"""
+        with self._lock:
+            if max_workers <= self.max_workers:
+                return
+            old = self._executor
+            self.max_workers = max_workers
+            self._executor = ThreadPoolExecutor(max_workers)
+        old.shutdown(wait=False)
+
+    def observe(self, endpoint, elapsed):
+        """Record the latency of a successful request"""
+        with self._lock:
+            latencies = self._latencies.get(endpoint)
+            if latencies is None:
+                latencies = self._latencies[endpoint] = deque(
+                    maxlen=self.window)
+            latencies.append(elapsed)
+
+    def get_delay(self, endpoint):
+        """Return the seconds to wait before hedging a request to the
+        endpoint, or None if too few latencies are observed.
+        """
+        with self._lock:
+            latencies = self._latencies.get(endpoint)
+            if latencies is None or len(latencies) < self.min_samples:
+                return None
+            latencies = sorted(latencies)
+        i = min(len(latencies) - 1, int(len(latencies) * self.quantile))
+        return max(self.min_delay, latencies[i])
+
+    def run(self, endpoint, send):
+        """Call ``send()`` and call it again if it doesn't return within
+        the delay of the endpoint, return the first response. The response
+        of the other call is closed.
+        """
+        delay = self.get_delay(endpoint)
+        with self._lock:
+            self.requests += 1
+        first = None if delay is None else self._submit(send)
+        if first is None:
+            return send()
+        done, _ = wait([first], delay)
+        if done:
+            return first.result()
+        second = self._submit(send)
+        if second is None:
+            return first.result()
+        with self._lock:
+            self.hedged += 1
+        pending = [first, second]
+        error = None
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            future = done.pop()
+            pending.remove(future)
+            if future.exception() is not None:
+                error = error or future.exception()
+                continue
+            for other in pending:
+                other.add_done_callback(_close_response)
+            if future is second:
+                with self._lock:
+                    self.hedge_wins += 1
+            return future.result()
+        raise error
+
+    def _submit(self, send):
+        """Run ``send()`` on a hedger thread, return None if they are all
+        busy, so that the requests don't queue up behind each other.
+        """
+        with self._lock:
+            if self._running >= self.max_workers:
+                return None
+            self._running += 1
+            executor = self._executor
+        future = executor.submit(send)
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future):
+        with self._lock:
+            self._running -= 1
+
+    @property
+    def stats(self):
+        return {'requests': self.requests, 'hedged': self.hedged,
+                'hedge_wins': self.hedge_wins,
+                'delays': dict((endpoint, self.get_delay(endpoint))
+                               for endpoint in list(self._latencies))}
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+def _close_response(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
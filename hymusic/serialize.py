@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""Compact serialization of models for caching across processes.
+
+The object graph is stored as one table of rows per model type, where the
+referenced models and the lists of models are replaced by the row indexes
+in the tables of their types. The models of the same entity are stored
+once, the first one found, so a playlist whose songs repeat the same
+albums and artists is smaller and faster to encode and decode than the
+pickled models. The sources are stored by name and the models are bound to
+the given or builtin sources on load::
+
+    data = dumps(playlist)
+    playlist = loads(data)  # bound to hymusic.netease
+    playlist = loads(data, source=NeteaseCloud(identity_map=IdentityMap()))
+
+The tables hold plain tuples encoded by :mod:`pickle`, which are loaded
+without allowing any class or function, see
+:func:`~hymusic.utils.plain_loads`.
+"""
+import pickle
+from collections import deque
+
+from .models import Album, Artist, Song, PlayList, User
+from .utils import LazyList, plain_loads
+
+MAGIC = b'HM\x03'
+
+MODEL_TYPES = dict((cls.__name__, cls)
+                   for cls in (Song, Album, Artist, PlayList, User))
+
+#: The model types of the fields holding lists of models
+LIST_FIELDS = {'_songs': Song, '_hot_albums': Album}
+
+
+def _get_schema(cls):
+    """Return the slot names of the class with the model type referenced by
+    each field, and whether it is a list.
+    """
+    schema = []
+    for name in cls.get_slot_names():
+        if name in cls.references:
+            schema.append((name, MODEL_TYPES[cls.references[name]], False))
+        elif name in LIST_FIELDS:
+            schema.append((name, LIST_FIELDS[name], True))
+        else:
+            schema.append((name, None, False))
+    return schema
+
+
+_schemas = dict((cls, _get_schema(cls)) for cls in MODEL_TYPES.values())
+
+
+def _get_key(obj):
+    """Return the key of the entity of the model, or the id of the model if
+    it can't be identified.
+    """
+    source = obj.source
+    try:
+        key = source.get_identifier(obj)
+    except AttributeError:
+        key = None
+    return (id(source), key) if key else (id(obj),)
+
+
+class _Encoder(object):
+    def __init__(self):
+        #: The models of each type, one per entity
+        self.objects = {}
+        #: The row indexes of the models by id
+        self.rows = {}
+        self._entities = {}
+
+    def add(self, obj):
+        """Add the model and the models it references to the tables"""
+        pending = deque([obj])
+        while pending:
+            obj = pending.popleft()
+            if id(obj) in self.rows:
+                continue
+            cls = obj.__class__
+            key = (cls, _get_key(obj))
+            index = self._entities.get(key)
+            if index is not None:
+                self.rows[id(obj)] = index
+                continue
+            objects = self.objects.setdefault(cls, [])
+            self.rows[id(obj)] = self._entities[key] = len(objects)
+            objects.append(obj)
+            for name, ref_cls, is_list in _schemas[cls]:
+                if ref_cls is None:
+                    continue
+                value = getattr(obj, name, None)
+                if is_list:
+                    pending.extend(value or ())
+                elif value is not None:
+                    pending.append(value)
+
+    def encode_value(self, value, ref_cls, is_list):
+        if value is None or ref_cls is None:
+            return value
+        if is_list:
+            return [self.rows[id(item)] for item in value]
+        return self.rows[id(value)]
+
+    def get_tables(self):
+        """Return the source names and the tables of rows"""
+        source_names, source_codes = [], {}
+        tables = []
+        for cls, objects in self.objects.items():
+            schema = _schemas[cls]
+            rows = []
+            for obj in objects:
+                source = obj.source
+                code = source_codes.get(id(source))
+                if code is None:
+                    code = source_codes[id(source)] = len(source_names)
+                    source_names.append(getattr(source, 'name', None))
+                row = [code]
+                for name, ref_cls, is_list in schema:
+                    row.append(self.encode_value(getattr(obj, name, None),
+                                                 ref_cls, is_list))
+                rows.append(tuple(row))
+            tables.append((cls.__name__, [name for name, _, _ in schema],
+                           rows))
+        return source_names, tables
+
+
+def dumps(models):
+    """Serialize a model or a list of models to bytes"""
+    single = not isinstance(models, (list, tuple, LazyList))
+    roots = [models] if single else list(models)
+    encoder = _Encoder()
+    for obj in roots:
+        encoder.add(obj)
+    source_names, tables = encoder.get_tables()
+    roots = [(obj.__class__.__name__, encoder.rows[id(obj)])
+             for obj in roots]
+    return MAGIC + pickle.dumps((source_names, tables, roots, single),
+                                pickle.HIGHEST_PROTOCOL)
+
+
+def _resolve_source(name, source):
+    if name is None:
+        return None
+    if source is None:
+        import hymusic
+        return hymusic.get_source(name)
+    if isinstance(source, dict):
+        return source[name]
+    return source
+
+
+def loads(data, source=None):
+    """Load the models serialized by :func:`dumps`.
+
+    :param source: the source to bind the models to, or a dict mapping the
+        source names to sources, default to the builtin sources. If the
+        source has an identity map, the loaded models are merged into it.
+    """
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError('Not serialized models')
+    source_names, tables, roots, single = plain_loads(data[len(MAGIC):])
+    sources = [_resolve_source(name, source) for name in source_names]
+    objects = {}
+    fields = {}
+    for type_name, names, rows in tables:
+        cls = MODEL_TYPES.get(type_name)
+        if cls is None:
+            raise ValueError('Unknown model type "%s"' % type_name)
+        schema = dict((name, (ref_cls, is_list))
+                      for name, ref_cls, is_list in _schemas[cls])
+        # The fields missing from the class are skipped
+        fields[type_name] = [(i, name) + schema[name]
+                             for i, name in enumerate(names, 1)
+                             if name in schema]
+        values = [(i, name) for i, name, ref_cls, _ in fields[type_name]
+                  if ref_cls is None]
+        objs = objects[type_name] = []
+        for row in rows:
+            obj = cls.__new__(cls)
+            obj.source = sources[row[0]]
+            for i, name in values:
+                if row[i] is not None:
+                    setattr(obj, name, row[i])
+            # Merge into the identity map before the references are set
+            if obj.source is not None and \
+                    obj.source.identity_map is not None:
+                obj = obj.source._intern(obj)
+            objs.append(obj)
+
+    for type_name, names, rows in tables:
+        refs = [(i, name, objects.get(ref_cls.__name__), is_list)
+                for i, name, ref_cls, is_list in fields[type_name]
+                if ref_cls is not None]
+        for obj, row in zip(objects[type_name], rows):
+            for i, name, targets, is_list in refs:
+                value = row[i]
+                if value is None:
+                    continue
+                if is_list:
+                    value = [targets[index] for index in value]
+                else:
+                    value = targets[value]
+                setattr(obj, name, value)
+    rv = [objects[type_name][index] for type_name, index in roots]
+    return rv[0] if single else rv
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""The HTTP session used by the sources."""
+import threading
+import time
+
+import requests
+
+from .pool import PoolAdapter
+
+
+class Session(requests.Session):
+    """A requests session which knows the endpoints of its source. It
+    caches the responses if a :class:`~hymusic.cache.ResponseCache` is set,
+    and paces the requests to the endpoints if a
+    :class:`~hymusic.ratelimit.RateLimiter` is set.
+
+    The requests are sent with the timeout of their endpoint, fail fast
+    if a :class:`~hymusic.resilience.CircuitBreaker` is set and the
+    endpoint is failing, and the GET requests are hedged if a
+    :class:`~hymusic.resilience.Hedger` is set.
+
+    The callables in ``before_request`` are called as ``hook(method, url,
+    kwargs)`` before a request is sent, and those in ``after_request`` as
+    ``hook(method, url, response, elapsed, error)`` after it, where
+    response is None if it failed with the error.
+
+    :param endpoints: the endpoint urls of the source
+    :param pool: the :class:`~hymusic.pool.PoolAdapter` to send requests
+        through, create a new one if None
+    """
+    def __init__(self, endpoints=(), pool=None):
+        super(Session, self).__init__()
+        self.pool = pool if pool is not None else PoolAdapter()
+        self.mount('http://', self.pool)
+        self.mount('https://', self.pool)
+        self.endpoints = sorted(endpoints, key=len, reverse=True)
+        self.cache = None
+        #: The default cache TTLs of the endpoints
+        self.cache_ttls = {}
+        self.rate_limiter = None
+        #: The (connect, read) timeouts of the endpoints
+        self.timeouts = {}
+        #: The (connect, read) timeout of the other requests
+        self.timeout = None
+        self.breaker = None
+        self.hedger = None
+        self.before_request = []
+        self.after_request = []
+        self._local = threading.local()
+
+    def match_endpoint(self, url):
+        """Return the longest endpoint url matching the url, or None"""
+        for endpoint in self.endpoints:
+            if url.startswith(endpoint):
+                return endpoint
+        return None
+
+    def get_endpoint(self, url):
+        """Return the endpoint the url belongs to, which is the longest
+        matching endpoint url, or the url without query string.
+        """
+        return self.match_endpoint(url) or url.split('?', 1)[0]
+
+    @property
+    def current_endpoint(self):
+        """The endpoint of the last request made in this thread, or None
+        if it matched no endpoint. It is set before the request is looked
+        up in the cache or hedged on other threads.
+        """
+        return getattr(self._local, 'endpoint', None)
+
+    def request(self, method, url, params=None, data=None, **kwargs):
+        self._local.endpoint = self.match_endpoint(url)
+        cache = self.cache
+        if cache is None or kwargs.get('stream'):
+            return self._hedge(method, url, params, data, **kwargs)
+        ttl = cache.get_ttl(self.get_endpoint(url), self.cache_ttls)
+        if not ttl:
+            return self._hedge(method, url, params, data, **kwargs)
+        key = cache.make_key(method, url, params, data)
+        r = cache.get(key)
+        if r is None:
+            r = self._hedge(method, url, params, data, **kwargs)
+            if r.status_code == 200:
+                cache.set(key, r, ttl)
+        return r
+
+    def _hedge(self, method, url, params, data, **kwargs):
+        hedger = self.hedger
+        endpoint = self.match_endpoint(url) if hedger is not None else None
+        # Only the idempotent API requests are hedged, not the downloads
+        if (endpoint is None or method.upper() != 'GET' or
+                kwargs.get('stream')):
+            return self._send(method, url, params, data, **kwargs)
+        return hedger.run(endpoint, lambda: self._send(
+            method, url, params, data, **kwargs))
+
+    def _send(self, method, url, params, data, **kwargs):
+        for hook in self.before_request:
+            hook(method, url, kwargs)
+        endpoint = self.match_endpoint(url)
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeouts.get(endpoint, self.timeout)
+        breaker = self.breaker if endpoint is not None else None
+        if breaker is not None:
+            breaker.before(endpoint)
+        # Only the API endpoints are limited, not the downloads
+        limiter = self.rate_limiter if endpoint is not None else None
+        if limiter is not None:
+            limiter.acquire(endpoint)
+        r = error = None
+        start = time.time()
+        try:
+            r = super(Session, self).request(method, url, params=params,
+                                             data=data, **kwargs)
+            return r
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            elapsed = time.time() - start
+            if limiter is not None:
+                limiter.feedback(endpoint, r, error)
+            if breaker is not None:
+                breaker.record(endpoint, r, error)
+            if (self.hedger is not None and endpoint is not None and
+                    r is not None and r.status_code < 500):
+                self.hedger.observe(endpoint, elapsed)
+            for hook in self.after_request:
+                hook(method, url, r, elapsed, error)
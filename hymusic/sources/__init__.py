@@ -1,14 +1,92 @@
-import requests
+import functools
+import itertools
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from hymusic.metrics import OTHER
+from hymusic.pool import PoolAdapter
+from hymusic.session import Session
+from hymusic.utils import chunked, strip_json, LazyList
 
 
 class BaseSource:
     """The base class for songbox sources.
     It may be subclasseed to create anther source.
+
+    A source may be shared by threads, the requests are sent through a
+    thread-safe connection pool, see :class:`~hymusic.pool.PoolAdapter`.
     """
-    def __init__(self):
-        self.session = requests.session()
+    #: The short name of the source
+    name = None
+
+    #: The max number of song ids sent in one song detail request
+    SONG_BATCH_SIZE = 1
+
+    #: The seconds to cache the responses of each endpoint
+    CACHE_TTLS = {}
+
+    #: The (connect, read) timeouts in seconds of each endpoint
+    TIMEOUTS = {}
+
+    #: The (connect, read) timeout in seconds of the other requests
+    TIMEOUT = (3.05, 10)
+
+    #: The max number of requests to send concurrently in batch methods
+    max_workers = 4
+
+    def __init__(self, identity_map=None, cache=None, rate_limiter=None,
+                 metrics=None, pool=None, breaker=None, hedger=None,
+                 lazy=False):
+        """
+        :param identity_map: an :class:`~hymusic.utils.IdentityMap` to
+            share the model objects of the same entity, disabled if None
+        :param cache: a :class:`~hymusic.cache.ResponseCache` to cache the
+            responses, disabled if None
+        :param rate_limiter: a :class:`~hymusic.ratelimit.RateLimiter` to
+            pace the requests, disabled if None
+        :param metrics: a :class:`~hymusic.metrics.Metrics` to record the
+            request metrics, disabled if None
+        :param pool: a :class:`~hymusic.pool.PoolAdapter` to send the
+            requests through, which may be shared by several sources,
+            default to a pool sized for ``max_workers`` threads
+        :param breaker: a :class:`~hymusic.resilience.CircuitBreaker` to
+            fail fast on failing endpoints, disabled if None
+        :param hedger: a :class:`~hymusic.resilience.Hedger` to hedge the
+            slow GET requests, disabled if None
+        :param lazy: keep the raw JSON of the songs of playlists and albums
+            and build the songs when accessed, see
+            :class:`~hymusic.utils.LazyList`. It saves the building time,
+            but the raw JSON may take more memory than the built songs
+        """
+        self.identity_map = identity_map
+        self.lazy = lazy
+        #: The callables called with every model object created
+        self.after_create = []
+        if pool is None:
+            pool = PoolAdapter(pool_maxsize=max(10, self.max_workers))
+        self.session = Session(self.get_endpoints(), pool)
+        self.session.cache = cache
+        self.session.cache_ttls = self.CACHE_TTLS
+        self.session.rate_limiter = rate_limiter
+        self.session.timeouts = self.TIMEOUTS
+        self.session.timeout = self.TIMEOUT
+        self.session.breaker = breaker
+        self.session.hedger = hedger
+        if hedger is not None:
+            # A first attempt and a hedge for each pooled connection
+            hedger.grow(2 * pool._pool_maxsize)
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.attach(self.session)
         self.set_session()
 
+    @classmethod
+    def get_endpoints(cls):
+        """Return the endpoint urls, the class attributes named *_URL"""
+        return [getattr(cls, name) for name in dir(cls)
+                if name.endswith('_URL')]
+
     def set_session(self):
         """Set additional information on requests session"""
 
@@ -25,3 +103,138 @@ class BaseSource:
         :param _bind: the binding object to return, create new if is None
         """
         raise NotImplementedError
+
+    def get_playlist_song_ids(self, playlist_id):
+        """Get a playlist without songs and the identifiers of its songs
+        in order, as cheaply as the source allows.
+        To be implemented in subclass.
+
+        :returns: a tuple of the playlist, the song identifiers and a
+            callable like :meth:`get_songs` to get the songs of some of the
+            identifiers, which builds them from the response if it had
+            their details
+        """
+        raise NotImplementedError
+
+    def get_songs(self, ids):
+        """Get songs detailed information by a list of ids. The ids are
+        split into chunks of ``SONG_BATCH_SIZE`` which are requested
+        concurrently.
+
+        :param ids: the song ids
+        :returns: a tuple of the songs in input order and the ids not found
+        """
+        ids = list(ids)
+        details = self._get_songs_json(ids)
+        rv, missing = [], []
+        for id in ids:
+            json = details.get(str(id))
+            if json is None:
+                missing.append(id)
+            else:
+                rv.append(self._build_song_from_json(json))
+        return rv, missing
+
+    def _get_songs_json(self, ids):
+        """Return a dict mapping song id strings to song json objects"""
+        rv = {}
+        chunks = chunked(ids, self.SONG_BATCH_SIZE)
+        for result in self._map(self._fetch_songs_json, chunks):
+            rv.update(result)
+        return rv
+
+    def _fetch_songs_json(self, ids):
+        """Request the song details of a chunk of ids.
+        To be implemented in subclass.
+        """
+        raise NotImplementedError
+
+    def _decode_jsonp(self, r):
+        """Decode the JSONP response, recording the time in the decode
+        phase of its endpoint if the metrics are enabled.
+        """
+        if self.metrics is None:
+            return strip_json(r.text)
+        start = time.time()
+        try:
+            return strip_json(r.text)
+        finally:
+            endpoint = self.session.match_endpoint(r.url) or OTHER
+            self.metrics.observe(endpoint, 'decode', time.time() - start)
+
+    def _create(self, cls, **fields):
+        """Create a model object. If the identity map is enabled, the
+        existing object of the same entity is returned instead, with the
+        new fields merged in.
+        """
+        obj = self._intern(cls(self, **fields))
+        for hook in self.after_create:
+            hook(obj)
+        return obj
+
+    def _build_list(self, build, items, **kwargs):
+        """Build the models of a list of JSON objects by
+        ``build(item, **kwargs)``, lazily if the source is lazy.
+        """
+        if self.lazy:
+            return LazyList(items, functools.partial(build, **kwargs))
+        return [build(item, **kwargs) for item in items]
+
+    def _intern(self, obj):
+        if self.identity_map is None:
+            return obj
+        try:
+            identifier = self.get_identifier(obj)
+        except AttributeError:
+            return obj
+        if not identifier:
+            # Missing or placeholder ids, such as 0 of unknown artists
+            return obj
+        key = (self.__class__.__name__, type(obj).__name__, identifier)
+        existing = self.identity_map.setdefault(key, obj)
+        if existing is not obj:
+            existing.update(obj)
+        return existing
+
+    def _iter_pages(self, fetch_page, maxpage=None, prefetch=0):
+        """Yield the pages returned by ``fetch_page(i)`` in order, until
+        ``maxpage`` pages are returned or a page is empty.
+
+        :param prefetch: the number of the following pages to fetch
+            concurrently while the current one is processed
+        """
+        indexes = iter(itertools.count() if maxpage is None
+                       else range(maxpage))
+        if not prefetch:
+            for i in indexes:
+                page = fetch_page(i)
+                if not page:
+                    return
+                yield page
+            return
+        executor = ThreadPoolExecutor(prefetch)
+        futures = deque(executor.submit(fetch_page, i)
+                        for i in itertools.islice(indexes, prefetch))
+        try:
+            while futures:
+                page = futures.popleft().result()
+                if not page:
+                    return
+                for i in itertools.islice(indexes, 1):
+                    futures.append(executor.submit(fetch_page, i))
+                yield page
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def _map(self, func, items):
+        """Call ``func`` on each item concurrently with at most
+        ``max_workers`` threads and return the results in order.
+        """
+        items = list(items)
+        if len(items) <= 1 or self.max_workers <= 1:
+            return [func(item) for item in items]
+        workers = min(self.max_workers, len(items))
+        with ThreadPoolExecutor(workers) as executor:
+            return list(executor.map(func, items))
@@ -1,14 +1,21 @@
 # -*- coding: utf-8 -*-
 import random
-from bs4 import BeautifulSoup
+from collections import OrderedDict
+try:
+    from lxml import etree, html as lxml_html
+except ImportError:
+    lxml_html = None
 from . import BaseSource
 from hymusic._compat import string_types
-from hymusic.utils import build_date, encrypted_id
+from hymusic.utils import build_date, encrypted_id, IdentityMap
+from hymusic.lyric import Lyric
+from hymusic.metrics import instrumented
 from hymusic.models import Album, Artist, Song, PlayList, User
 
 
 class NeteaseCloud(BaseSource):
     """http://music.163.com"""
+    name = 'netease'
 
     WEB_ROOT = 'http://music.163.com'
     API_ROOT = WEB_ROOT + '/api'
@@ -24,46 +31,110 @@ class NeteaseCloud(BaseSource):
 
     SONG_URL = API_ROOT + '/song/detail/'
     PLAYLIST_URL = API_ROOT + '/playlist/detail'
+    PLAYLIST_SONG_IDS_URL = API_ROOT + '/v6/playlist/detail'
     ALBUM_URL = API_ROOT + '/album/'
     ARTIST_URL = API_ROOT + '/artist/album/'
     LYRIC_URL = API_ROOT + '/song/lyric'
 
+    SONG_BATCH_SIZE = 200
+
+    CACHE_TTLS = {PLAYLIST_HUB_URL: 10 * 60,
+                  SEARCH_URL: 10 * 60,
+                  SONG_URL: 60 * 60,
+                  PLAYLIST_URL: 10 * 60,
+                  ALBUM_URL: 6 * 60 * 60,
+                  ARTIST_URL: 6 * 60 * 60,
+                  LYRIC_URL: 24 * 60 * 60}
+
+    # The playlists with thousands of songs are slow to return
+    TIMEOUTS = {PLAYLIST_URL: (3.05, 30)}
+
+    #: The max number of parsed lyrics to keep
+    LYRIC_CACHE_SIZE = 1024
+
+    def __init__(self, *args, **kwargs):
+        BaseSource.__init__(self, *args, **kwargs)
+        self._lyrics = IdentityMap(maxsize=self.LYRIC_CACHE_SIZE)
+
     def get_identifier(self, object):
         return object.id
 
     def set_session(self):
         self.session.headers = {'referer': self.WEB_ROOT}
 
-    def get_playlists(self, maxpage=None, cat=None, order=None):
+    def get_playlists(self, maxpage=None, cat=None, order=None, prefetch=0):
         """Get playlists
 
         :param maxpage: the max page number to return
         :param cat: the playlist category
         :param order: hot/new
+        :param prefetch: the number of pages to fetch ahead concurrently
         :returns: a generator
         """
-        i = 0
-        payload = {'cat': cat, 'order': order,
-                   'limit': 35, 'offset': 0}
-        while maxpage is None or i < maxpage:
+        def fetch_page(i):
+            payload = {'cat': cat, 'order': order,
+                       'limit': 35, 'offset': 35 * i}
             r = self.session.get(self.PLAYLIST_HUB_URL, params=payload)
-            soup = BeautifulSoup(r.text, 'lxml')
-            results = soup.select('#m-pl-container > li')
+            if lxml_html is not None:
+                items = self._parse_playlist_hub(r.content,
+                                                 r.encoding or 'utf-8')
+            else:
+                items = self._parse_playlist_hub_bs4(r.text)
             rv = []
-            for pl in results:
-                cover_url = pl.div.img['src'].split('?')[0]
-                title = pl.div.a['title']
-                id = pl.div.a['href'].split('id=')[1]
-                creator = pl.find('a', class_='nm')
-                creator_id = int(creator['href'].split('id=')[1])
-                creator_name = creator.string
-                rv.append(PlayList(self, id=int(id), name=title,
-                                   cover_url=cover_url,
-                                   creator=User(self, name=creator_name,
-                                                id=creator_id)))
-            yield rv
-            payload['offset'] += 35
-            i += 1
+            for id, title, cover_url, creator_id, creator_name in items:
+                creator = self._create(User, name=creator_name,
+                                       id=creator_id)
+                rv.append(self._create(PlayList, id=id, name=title,
+                                       cover_url=cover_url,
+                                       creator=creator))
+            return rv
+
+        return self._iter_pages(fetch_page, maxpage, prefetch)
+
+    if lxml_html is not None:
+        _hub_items = etree.XPath('//*[@id="m-pl-container"]/li')
+        _hub_creator = etree.XPath(
+            './/a[contains(concat(" ", normalize-space(@class), " "),'
+            ' " nm ")]')
+
+    def _parse_playlist_hub(self, content, encoding='utf-8'):
+        """Parse the playlist hub page with lxml XPath.
+
+        :param content: the page bytes
+        :param encoding: the charset of the response, lxml would fall back
+            to latin-1 if the page has no meta charset
+        :returns: a list of (id, title, cover_url, creator_id,
+            creator_name) tuples
+        """
+        root = lxml_html.fromstring(
+            content, parser=lxml_html.HTMLParser(encoding=encoding))
+        rv = []
+        for pl in self._hub_items(root):
+            div = next(pl.iter('div'))
+            link = next(div.iter('a'))
+            creator = self._hub_creator(pl)[0]
+            rv.append((int(link.get('href').split('id=')[1]),
+                       link.get('title'),
+                       next(div.iter('img')).get('src').split('?')[0],
+                       int(creator.get('href').split('id=')[1]),
+                       creator.text if len(creator) == 0 else None))
+        return rv
+
+    def _parse_playlist_hub_bs4(self, text):
+        """Parse the playlist hub page with BeautifulSoup, used when lxml
+        is not installed, see :meth:`_parse_playlist_hub`.
+        """
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(text, 'html.parser')
+        rv = []
+        for pl in soup.select('#m-pl-container > li'):
+            creator = pl.find('a', class_='nm')
+            rv.append((int(pl.div.a['href'].split('id=')[1]),
+                       pl.div.a['title'],
+                       pl.div.img['src'].split('?')[0],
+                       int(creator['href'].split('id=')[1]),
+                       creator.string))
+        return rv
 
     def search(self, target, type='song', maxresults=None, **kwargs):
         """Search song by target string.
@@ -92,7 +163,7 @@ class NeteaseCloud(BaseSource):
         obj = self._build_song_from_json(rv)
         if _bind is None:
             return obj
-        _bind.__dict__.update(obj.__dict__)
+        _bind.update(obj)
         return _bind
 
     def get_playlist(self, playlist_id, _bind=None):
@@ -102,9 +173,20 @@ class NeteaseCloud(BaseSource):
         obj = self._build_playlist_from_json(rv)
         if _bind is None:
             return obj
-        _bind.__dict__.update(obj.__dict__)
+        _bind.update(obj)
         return _bind
 
+    def get_playlist_song_ids(self, playlist_id):
+        """Get a playlist without songs and its song IDs in order, by a
+        request which doesn't return the song details.
+        """
+        payload = {'id': playlist_id, 'n': 0}
+        r = self.session.get(self.PLAYLIST_SONG_IDS_URL, params=payload)
+        rv = r.json()['playlist']
+        ids = [item['id'] for item in rv.pop('trackIds', None) or ()]
+        rv.pop('tracks', None)
+        return self._build_playlist_from_json(rv), ids, self.get_songs
+
     def get_album(self, album_id, _bind=None):
         """Get album detailed information by ID"""
         r = self.session.get(self.ALBUM_URL + str(album_id))
@@ -112,7 +194,7 @@ class NeteaseCloud(BaseSource):
         obj = self._build_album_from_json(rv)
         if _bind is None:
             return obj
-        _bind.__dict__.update(obj.__dict__)
+        _bind.update(obj)
         return _bind
 
     def get_artist(self, artist_id, _bind=None):
@@ -125,7 +207,7 @@ class NeteaseCloud(BaseSource):
             obj.hot_albums.append(self._build_album_from_json(album))
         if _bind is None:
             return obj
-        _bind.__dict__.update(obj.__dict__)
+        _bind.update(obj)
         return _bind
 
     # From https://github.com/darknessomi/musicbox/blob/master/NEMbox/api.py#L132
@@ -134,26 +216,54 @@ class NeteaseCloud(BaseSource):
         payload = {'id': song_id, 'ids': '[%s]' % song_id}
         r = self.session.get(self.SONG_URL, params=payload)
         rv = r.json()[self.SEARCH_TYPE_MAP['song'][1]][0]
-        if quality == 'high' and rv.get('hMusic'):
-            music = rv['hMusic']
-        elif quality == 'medium' and rv.get('mMusic'):
-            music = rv['mMusic']
-        elif quality == 'low' and rv.get('lMusic'):
-            music = rv['lMusic']
+        return self._get_song_url_from_json(rv, quality)
+
+    def get_song_urls(self, song_ids, quality='high'):
+        """Get song urls by a list of IDs, see :meth:`get_songs`.
+
+        :returns: a tuple of an ordered dict mapping the IDs to urls and
+            the IDs not found
+        """
+        song_ids = list(song_ids)
+        details = self._get_songs_json(song_ids)
+        rv, missing = OrderedDict(), []
+        for song_id in song_ids:
+            json = details.get(str(song_id))
+            if json is None:
+                missing.append(song_id)
+            else:
+                rv[song_id] = self._get_song_url_from_json(json, quality)
+        return rv, missing
+
+    def _fetch_songs_json(self, song_ids):
+        payload = {'ids': '[%s]' % ','.join(str(id) for id in song_ids)}
+        r = self.session.get(self.SONG_URL, params=payload)
+        return dict((str(item['id']), item)
+                    for item in r.json()[self.SEARCH_TYPE_MAP['song'][1]])
+
+    def _get_song_url_from_json(self, json, quality='high'):
+        if quality == 'high' and json.get('hMusic'):
+            music = json['hMusic']
+        elif quality == 'medium' and json.get('mMusic'):
+            music = json['mMusic']
+        elif quality == 'low' and json.get('lMusic'):
+            music = json['lMusic']
         else:
-            return rv['mp3Url']
+            return json['mp3Url']
 
-        quality = quality + ' {0}k'.format(music['bitrate'] // 1000)
         song_id = str(music['dfsId'])
         enc_id = encrypted_id(song_id)
         url = 'http://m%s.music.126.net/%s/%s.mp3' % (random.randrange(1, 3),
                                                       enc_id, song_id)
         return url
 
+    def _get_lyric_json(self, song_id):
+        payload = {'id': song_id, 'lv': -1, 'kv': -1, 'tv': -1}
+        return self.session.get(self.LYRIC_URL, params=payload).json()
+
     def get_song_lyric(self, song_id, type='lyric'):
         """Get song lyrics by ID"""
-        payload = {'id': song_id, 'lv': -1, 'kv': -1, 'tv': -1}
-        rv = self.session.get(self.LYRIC_URL, params=payload).json()
+        rv = self._get_lyric_json(song_id)
         if type == 'lyric':
             return rv['lrc']['lyric']
         elif type == 'klyric':
@@ -161,6 +271,32 @@ class NeteaseCloud(BaseSource):
         elif type == 'tlyric':
             return rv['tlyric']['lyric']
 
+    def get_lyric(self, song_id):
+        """Get the parsed lyric by ID, with the translation aligned, see
+        :class:`~hymusic.lyric.Lyric`. The parsed lyrics are cached.
+        """
+        lyric = self._lyrics.get(song_id)
+        if lyric is None:
+            rv = self._get_lyric_json(song_id)
+            lyric = Lyric.parse((rv.get('lrc') or {}).get('lyric'),
+                                (rv.get('tlyric') or {}).get('lyric'))
+            lyric = self._lyrics.setdefault(song_id, lyric)
+        return lyric
+
+    def get_lyrics(self, song_ids):
+        """Get the parsed lyrics by a list of IDs, the ones not cached
+        are requested concurrently.
+
+        :returns: an ordered dict mapping the IDs to lyrics
+        """
+        rv = OrderedDict((song_id, self._lyrics.get(song_id))
+                         for song_id in song_ids)
+        missing = [song_id for song_id, lyric in rv.items() if lyric is None]
+        for song_id, lyric in zip(missing, self._map(self.get_lyric, missing)):
+            rv[song_id] = lyric
+        return rv
+
+    @instrumented
     def _build_song_from_json(self, json, **kwargs):
         artist = self._build_artist_from_json(json['artists'][0])
         fields = dict(
@@ -169,8 +305,9 @@ class NeteaseCloud(BaseSource):
             id=int(json['id']), name=json['name'],
             duration=json['duration']/1000,
             publish_time=json['album']['publishTime']/1000)
-        return Song(self, **fields)
+        return self._create(Song, **fields)
 
+    @instrumented
     def _build_album_from_json(self, json, **kwargs):
         fields = dict(
             artist=self._build_artist_from_json(json['artist']),
@@ -181,12 +318,13 @@ class NeteaseCloud(BaseSource):
             id=int(json['id'])
         )
         if json.get('songs'):
-            fields['songs'] = [self._build_song_from_json(item)
-                               for item in json['songs']]
+            fields['songs'] = self._build_list(self._build_song_from_json,
+                                               json['songs'])
         # Enable pass artist from caller
         fields.update(kwargs)
-        return Album(self, **fields)
+        return self._create(Album, **fields)
 
+    @instrumented
     def _build_artist_from_json(self, json, **kwargs):
         fields = dict(
             id=json['id'],
@@ -194,8 +332,9 @@ class NeteaseCloud(BaseSource):
             cover_url=json.get('picUrl')
         )
         fields.update(kwargs)
-        return Artist(self, **fields)
+        return self._create(Artist, **fields)
 
+    @instrumented
     def _build_playlist_from_json(self, json, **kwargs):
         fields = dict(id=json['id'],
                       name=json['name'],
@@ -206,11 +345,12 @@ class NeteaseCloud(BaseSource):
                       shared_count=json.get('sharedCount'),
                       creator=self._build_user_from_json(json['creator']))
         if 'tracks' in json:
-            fields['songs'] = [self._build_song_from_json(item)
-                               for item in json['tracks']]
+            fields['songs'] = self._build_list(self._build_song_from_json,
+                                               json['tracks'])
         fields.update(kwargs)
-        return PlayList(self, **fields)
+        return self._create(PlayList, **fields)
 
+    @instrumented
     def _build_user_from_json(self, json, **kwargs):
         if json.get('gender') is None:
             gender = None
@@ -225,4 +365,4 @@ class NeteaseCloud(BaseSource):
                       signature=json.get('signature')
                       )
         fields.update(kwargs)
-        return User(self, **fields)
+        return self._create(User, **fields)
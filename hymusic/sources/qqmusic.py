@@ -2,12 +2,14 @@
 import random
 
 from . import BaseSource
-from hymusic.utils import build_date, alternative_get, strip_json
+from hymusic.utils import build_date, alternative_get, KeyMap
+from hymusic.metrics import instrumented
 from hymusic.models import Album, Artist, Song, PlayList, User
 
 
 class QQMusic(BaseSource):
     """https://y.qq.com"""
+    name = 'qqmusic'
     API_ROOT = 'https://c.y.qq.com'
     SEARCH_URL = API_ROOT + '/soso/fcgi-bin/search_cp'
     SEARCH_PLAYLIST_URL = (API_ROOT + '/soso/fcgi-bin/'
@@ -21,6 +23,36 @@ class QQMusic(BaseSource):
     CATEGORY_URL = API_ROOT + '/splcloud/fcgi-bin/fcg_get_diss_tag_conf.fcg'
     COMMENT_URL = API_ROOT + '/rsc/fcgi-bin/fcg_get_bullet_info.fcg'
 
+    CACHE_TTLS = {SEARCH_URL: 10 * 60,
+                  SEARCH_PLAYLIST_URL: 10 * 60,
+                  PLAYLIST_HUB_URL: 10 * 60,
+                  SONG_URL: 60 * 60,
+                  ALBUM_URL: 6 * 60 * 60,
+                  PLAYLIST_URL: 10 * 60,
+                  ARTIST_URL: 6 * 60 * 60,
+                  CATEGORY_URL: 24 * 60 * 60,
+                  COMMENT_URL: 10 * 60}
+
+    # The playlists with thousands of songs are slow to return
+    TIMEOUTS = {PLAYLIST_URL: (3.05, 30)}
+
+    #: The alternative keys of the fields in the responses
+    SONG_KEYS = KeyMap(id=('id', 'songid'), mid=('mid', 'songmid'),
+                       name=('name', 'songname'), album=('album',))
+    ALBUM_KEYS = KeyMap(id=('id', 'albumid', 'albumID'),
+                        mid=('mid', 'albummid', 'albumMID'),
+                        name=('name', 'albumname', 'albumName'),
+                        singer=('singerID', 'singerid'))
+    ARTIST_KEYS = KeyMap(id=('id', 'singerid', 'singerID', 'singer_id'),
+                         mid=('mid', 'singermid', 'singerMID', 'singer_mid'),
+                         name=('name', 'singername', 'singerName',
+                               'singer_name'))
+    PLAYLIST_KEYS = KeyMap(id=('disstid', 'dissid'),
+                           cover_url=('logo', 'imgurl'),
+                           song_count=('total_song_num', 'song_count'),
+                           play_count=('visitnum', 'listennum'))
+    USER_KEYS = KeyMap(id=('uin', 'creator_uin'), name=('name', 'nickname'))
+
     def get_identifier(self, object):
         if isinstance(object, PlayList):
             return object.id
@@ -30,30 +62,32 @@ class QQMusic(BaseSource):
         self.session.headers = {'Host': 'c.y.qq.com',
                                 'Referer': 'https://y.qq.com/'}
 
-    def get_playlists(self, maxpage=None, cat=None, order=None):
+    def get_playlists(self, maxpage=None, cat=None, order=None, prefetch=0):
         """Get playlists
 
         :param maxpage: the max page number to return
         :param cat: the playlist category
         :param order: hot/new
+        :param prefetch: the number of pages to fetch ahead concurrently
         :returns: a generator
         """
         cat_id = self._get_category_id(cat)
         order_id = 5
         if order == 'new':
             order_id = 2
-        payload = {'rnd': random.random(), 'format': 'json', 'platform': 'yqq',
-                   'sortId': order_id, 'categoryId': cat_id,
-                   'sin': 0, 'ein': 29}
-        i = 0
-        while maxpage is None or i < maxpage:
+
+        def fetch_page(i):
+            payload = {'rnd': random.random(), 'format': 'json',
+                       'platform': 'yqq', 'sortId': order_id,
+                       'categoryId': cat_id, 'sin': 30 * i,
+                       'ein': 30 * i + 29}
             r = self.session.get(self.PLAYLIST_HUB_URL, params=payload)
             data = r.json()['data']['list']
-            yield [self._build_playlist_from_json(item) for item in data]
-            i += 1
-            payload['rnd'] = random.random()
-            payload['sin'] += 30
-            payload['ein'] += 30
+            shape = {}
+            return [self._build_playlist_from_json(item, _shape=shape)
+                    for item in data]
+
+        return self._iter_pages(fetch_page, maxpage, prefetch)
 
     def search(self, target, type='song', maxresults=None, **kwargs):
         """Search song by target string.
@@ -69,7 +103,7 @@ class QQMusic(BaseSource):
         try:
             data = r.json()
         except Exception:
-            data = strip_json(r.text)
+            data = self._decode_jsonp(r)
         if type == 'playlist':
             data = data['data']['list']
         else:
@@ -77,22 +111,34 @@ class QQMusic(BaseSource):
         # return data
         rv = []
         builder = getattr(self, '_build_%s_from_json' % type)
+        shape = {}
         for result in data:
-            item = builder(result)
+            item = builder(result, _shape=shape)
             if item.match_fields(kwargs):
                 rv.append(item)
         return rv
 
-    def get_song(self, song_mid, _bind):
+    def get_song(self, song_mid, _bind=None):
+        """Get song detailed information by mid"""
         r = self.session.get(self.SONG_URL, params={'songmid': song_mid,
                                                     'format': 'json'})
         rv = r.json()['data'][0]
-        obj = self._build_playlist_from_json(rv)
+        obj = self._build_song_from_json(rv)
         if _bind is None:
             return obj
-        _bind.__dict__.update(obj.__dict__)
+        _bind.update(obj)
         return _bind
 
+    def _fetch_songs_json(self, song_mids):
+        # The song detail endpoint only takes one mid per request.
+        rv = {}
+        for song_mid in song_mids:
+            r = self.session.get(self.SONG_URL, params={'songmid': song_mid,
+                                                        'format': 'json'})
+            for item in r.json()['data']:
+                rv[str(alternative_get(item, 'mid', 'songmid'))] = item
+        return rv
+
     def get_album(self, album_mid, _bind=None):
         """Get album detailed information by ID"""
         payload = {
@@ -107,24 +153,52 @@ class QQMusic(BaseSource):
         obj = self._build_album_from_json(rv)
         if _bind is None:
             return obj
-        _bind.__dict__.update(obj.__dict__)
+        _bind.update(obj)
         return _bind
 
-    def get_playlist(self, playlist_id, _bind=None):
-        """Get playlist detailed information by ID"""
+    def _get_playlist_json(self, playlist_id):
         payload = dict(
             type=1, json=1, utf8=1, onlysong=0,
             disstid=playlist_id, format='json',
             inCharset='utf-8', outCharset='utf-8', platform='yqq'
         )
         r = self.session.get(self.PLAYLIST_URL, params=payload)
-        rv = strip_json(r.text)['cdlist'][0]
-        obj = self._build_playlist_from_json(rv)
+        return self._decode_jsonp(r)['cdlist'][0]
+
+    def get_playlist(self, playlist_id, _bind=None):
+        """Get playlist detailed information by ID"""
+        obj = self._build_playlist_from_json(
+            self._get_playlist_json(playlist_id))
         if _bind is None:
             return obj
-        _bind.__dict__.update(obj.__dict__)
+        _bind.update(obj)
         return _bind
 
+    def get_playlist_song_ids(self, playlist_id):
+        """Get a playlist without songs and its song mids in order. The
+        response has the song details already, so the songs are built from
+        it when asked instead of being requested one by one.
+        """
+        rv = self._get_playlist_json(playlist_id)
+        tracks = {}
+        ids = []
+        for item in rv.pop('songlist', None) or ():
+            mid = alternative_get(item, 'songmid', 'mid')
+            tracks.setdefault(mid, item)
+            ids.append(mid)
+
+        def get_songs(song_mids):
+            rv, missing, shape = [], [], {}
+            for mid in song_mids:
+                if mid in tracks:
+                    rv.append(self._build_song_from_json(tracks[mid],
+                                                         _shape=shape))
+                else:
+                    missing.append(mid)
+            return rv, missing
+
+        return self._build_playlist_from_json(rv), ids, get_songs
+
     def get_artist(self, artist_id, _bind=None):
         """Get playlist detailed information by ID"""
         payload = dict(
@@ -132,11 +206,11 @@ class QQMusic(BaseSource):
             platform='yqq', inCharset='utf-8', outCharset='utf-8'
         )
         r = self.session.get(self.ARTIST_URL, params=payload)
-        rv = strip_json(r.text)['data']
+        rv = self._decode_jsonp(r)['data']
         obj = self._build_artist_from_json(rv)
         if _bind is None:
             return obj
-        _bind.__dict__.update(obj.__dict__)
+        _bind.update(obj)
         return _bind
 
     def _build_payload(self, target, type, maxresults):
@@ -169,87 +243,110 @@ class QQMusic(BaseSource):
         else:
             raise NotImplementedError
 
-    def _build_song_from_json(self, json, **kwargs):
-        artist = self._build_artist_from_json(json['singer'])
-        if 'album' in json:
-            album = self._build_album_from_json(json['album'], artist=artist)
+    # The builders take the keys resolved for the first object of a
+    # response from the ``_shape`` dict, with a nested dict per builder
+    # they call, see :meth:`~hymusic.utils.KeyMap.resolve`.
+
+    @instrumented
+    def _build_song_from_json(self, json, _shape=None, **kwargs):
+        shape = {} if _shape is None else _shape
+        keys = self.SONG_KEYS.resolve(json, shape)
+        artist = self._build_artist_from_json(
+            json['singer'], _shape=shape.setdefault('artist', {}))
+        if keys['album'] in json:
+            album = self._build_album_from_json(
+                json[keys['album']], artist=artist,
+                _shape=shape.setdefault('album', {}))
         else:
-            album = self._build_album_from_json(json, artist=artist)
+            album = self._build_album_from_json(
+                json, artist=artist, _shape=shape.setdefault('album', {}))
         publish_time = json.get('time_public', build_date(json.get('pubtime')))
-        fields = {'id': alternative_get(json, 'id', 'songid'),
-                  'mid': alternative_get(json, 'mid', 'songmid'),
-                  'name': alternative_get(json, 'name', 'songname'),
+        fields = {'id': json.get(keys['id']),
+                  'mid': json.get(keys['mid']),
+                  'name': json.get(keys['name']),
                   'duration': json['interval'],
                   'publish_time': publish_time,
                   'album': album,
                   'artist': artist}
         fields.update(kwargs)
-        return Song(self, **fields)
+        return self._create(Song, **fields)
 
-    def _build_album_from_json(self, json, **kwargs):
-        mid = alternative_get(json, 'mid', 'albummid', 'albumMID')
+    @instrumented
+    def _build_album_from_json(self, json, _shape=None, **kwargs):
+        shape = {} if _shape is None else _shape
+        keys = self.ALBUM_KEYS.resolve(json, shape)
+        mid = json.get(keys['mid'])
         fields = dict(
-            id=alternative_get(json, 'id', 'albumid', 'albumID'),
+            id=json.get(keys['id']),
             mid=mid,
-            name=alternative_get(json, 'name', 'albumname', 'albumName'),
+            name=json.get(keys['name']),
             publish_time=build_date(json.get('pubtime')),
             company=json.get('company'),
             cover_url=('https://y.gtimg.cn/music/photo_new/'
                        'T002R500x500M000$%s.jpg' % mid)
         )
-        if 'singerID' in json or 'singerid' in json:
-            fields['artist'] = self._build_artist_from_json(json)
+        if 'artist' not in kwargs and keys['singer'] in json:
+            fields['artist'] = self._build_artist_from_json(
+                json, _shape=shape.setdefault('artist', {}))
         if 'list' in json:
-            fields['songs'] = [self._build_song_from_json(item)
-                               for item in json['list']]
+            fields['songs'] = self._build_list(self._build_song_from_json,
+                                               json['list'], _shape={})
         fields.update(kwargs)
-        return Album(self, **fields)
+        return self._create(Album, **fields)
 
-    def _build_artist_from_json(self, json, **kwargs):
+    @instrumented
+    def _build_artist_from_json(self, json, _shape=None, **kwargs):
         if isinstance(json, list):
             json = json[0]
-        mid = alternative_get(json, 'mid', 'singermid',
-                              'singerMID', 'singer_mid')
+        keys = self.ARTIST_KEYS.resolve(json, _shape)
+        mid = json.get(keys['mid'])
         fields = dict(
-            id=alternative_get(json, 'id', 'singerid',
-                               'singerID', 'singer_id'),
+            id=json.get(keys['id']),
             mid=mid,
-            name=alternative_get(json, 'name', 'singername',
-                                 'singerName', 'singer_name'),
+            name=json.get(keys['name']),
             cover_url=('https://y.gtimg.cn/music/photo_new/'
                        'T001R300x300M000%s.jpg' % mid)
         )
         if 'list' in json:
-            json['hot_albums'] = [self._build_album_from_json(item)
-                                  for item in json['list']]
+            shape = {}
+            fields['hot_albums'] = [
+                self._build_album_from_json(item, _shape=shape)
+                for item in json['list']]
         fields.update(kwargs)
-        return Artist(self, **fields)
+        return self._create(Artist, **fields)
 
-    def _build_playlist_from_json(self, json, **kwargs):
+    @instrumented
+    def _build_playlist_from_json(self, json, _shape=None, **kwargs):
+        shape = {} if _shape is None else _shape
+        keys = self.PLAYLIST_KEYS.resolve(json, shape)
+        user_shape = shape.setdefault('creator', {})
         if 'creator' in json:
-            creator = self._build_user_from_json(json['creator'])
+            creator = self._build_user_from_json(json['creator'],
+                                                 _shape=user_shape)
         else:
-            creator = self._build_user_from_json(json)
+            creator = self._build_user_from_json(json, _shape=user_shape)
         fields = dict(
-            id=int(alternative_get(json, 'disstid', 'dissid')),
+            id=int(json[keys['id']]),
             name=json['dissname'],
-            cover_url=alternative_get(json, 'logo', 'imgurl'),
-            song_count=alternative_get(json, 'total_song_num', 'song_count'),
-            play_count=alternative_get(json, 'visitnum', 'listennum'),
+            cover_url=json.get(keys['cover_url']),
+            song_count=json.get(keys['song_count']),
+            play_count=json.get(keys['play_count']),
             creator=creator)
         fields.update(kwargs)
         if 'songlist' in json:
-            fields['songs'] = [self._build_song_from_json(item)
-                               for item in json['songlist']]
-        return PlayList(self, **fields)
+            fields['songs'] = self._build_list(self._build_song_from_json,
+                                               json['songlist'], _shape={})
+        return self._create(PlayList, **fields)
 
-    def _build_user_from_json(self, json, **kwargs):
-        fields = dict(id=alternative_get(json, 'uin', 'creator_uin'),
-                      name=alternative_get(json, 'name', 'nickname'),
+    @instrumented
+    def _build_user_from_json(self, json, _shape=None, **kwargs):
+        keys = self.USER_KEYS.resolve(json, _shape)
+        fields = dict(id=json.get(keys['id']),
+                      name=json.get(keys['name']),
                       avatar_url=json.get('avatarUrl')
                       )
         fields.update(kwargs)
-        return User(self, **fields)
+        return self._create(User, **fields)
 
     def _get_category_id(self, catname):
         if catname is None:
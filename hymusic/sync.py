@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""Incremental sync of tracked playlists.
+
+A compact :class:`Snapshot` of each playlist is kept: the song ids, the
+song count, a hash of the ids and the update time. A sync fetches the song
+ids only, and the details of the added songs unless the source returned
+them with the ids, so its cost depends on how many songs changed rather
+than on the size of the playlists::
+
+    sync = PlaylistSync(netease)
+    sync.sync(12345)  # The first sync returns all songs as added
+    ...
+    for change in sync.sync_many(playlist_ids):
+        if change.changed:
+            handle(change.playlist, change.added, change.removed)
+
+Playlist objects can be passed instead of ids. Those whose song count is
+loaded and equals the one of the snapshot are skipped without any request,
+such as the QQ Music hub playlists. The Netease hub pages have no song
+count, so their playlists are always synced.
+"""
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ._compat import json
+from .loader import is_loaded
+from .models import PlayList
+
+
+def hash_ids(ids):
+    """Return the hex digest of a sequence of ids, order sensitive"""
+    return hashlib.sha1(
+        u'\n'.join(str(id) for id in ids).encode('utf-8')).hexdigest()
+
+
+class Snapshot(object):
+    """The synced state of a playlist.
+
+    :param playlist_id: the playlist id
+    :param song_ids: the song identifiers in order
+    :param song_count: the song count reported by the source
+    :param digest: the hash of the song ids, computed if None
+    :param update_time: the epoch time the song ids last changed
+    """
+    __slots__ = ('playlist_id', 'song_ids', 'song_count', 'digest',
+                 'update_time')
+
+    def __init__(self, playlist_id, song_ids, song_count=None, digest=None,
+                 update_time=None):
+        self.playlist_id = playlist_id
+        self.song_ids = tuple(song_ids)
+        self.song_count = song_count
+        self.digest = digest or hash_ids(self.song_ids)
+        self.update_time = update_time or time.time()
+
+    def __repr__(self):
+        return '<Snapshot(%s): %d songs>' % (self.playlist_id,
+                                             len(self.song_ids))
+
+    def to_dict(self):
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+class PlaylistChange(object):
+    """The result of syncing a playlist.
+
+    :param playlist: the playlist, without songs loaded by the sync
+    :param added: the songs added since the last sync, in playlist order
+    :param removed: the identifiers of the songs removed
+    :param snapshot: the new snapshot
+    :param missing: the identifiers of the added songs the source failed
+        to return, which are retried by the next sync
+    """
+    __slots__ = ('playlist', 'added', 'removed', 'snapshot', 'missing')
+
+    def __init__(self, playlist, added=(), removed=(), snapshot=None,
+                 missing=()):
+        self.playlist = playlist
+        self.added = list(added)
+        self.removed = list(removed)
+        self.snapshot = snapshot
+        self.missing = list(missing)
+
+    def __repr__(self):
+        return '<PlaylistChange(%s): +%d -%d>' % (
+            self.snapshot.playlist_id if self.snapshot else None,
+            len(self.added), len(self.removed))
+
+    @property
+    def changed(self):
+        return bool(self.added or self.removed)
+
+
+class PlaylistSync(object):
+    """Sync the playlists of a source against their snapshots.
+
+    :param source: the source of the playlists
+    :param snapshots: a dict mapping the playlist ids to snapshots, such
+        as a previously saved state, see :meth:`load`
+    :param max_workers: the max number of playlists synced concurrently
+    """
+    def __init__(self, source, snapshots=None, max_workers=4):
+        self.source = source
+        self.snapshots = snapshots if snapshots is not None else {}
+        self.max_workers = max_workers
+
+    def is_stale(self, playlist):
+        """Check cheaply if the playlist may have changed since the last
+        sync, from the song count it was loaded with. The playlist is stale
+        if it is not synced yet or the song count is not loaded.
+        """
+        snapshot = self.snapshots.get(playlist.id)
+        if snapshot is None or not is_loaded(playlist, 'song_count'):
+            return True
+        return playlist.song_count != snapshot.song_count
+
+    def sync(self, playlist):
+        """Sync a playlist and return a :class:`PlaylistChange`.
+
+        :param playlist: a playlist id, or a playlist object whose loaded
+            song count is checked first to skip the unchanged playlists
+        """
+        if isinstance(playlist, PlayList):
+            if not self.is_stale(playlist):
+                return PlaylistChange(playlist,
+                                      snapshot=self.snapshots[playlist.id])
+            playlist = playlist.id
+        old = self.snapshots.get(playlist)
+        obj, song_ids, get_songs = self.source.get_playlist_song_ids(
+            playlist)
+        song_count = obj.song_count if is_loaded(obj, 'song_count') else None
+        if old is not None and old.digest == hash_ids(song_ids):
+            if song_count != old.song_count:
+                old = self.snapshots[playlist] = Snapshot(
+                    playlist, old.song_ids, song_count, old.digest,
+                    old.update_time)
+            return PlaylistChange(obj, snapshot=old)
+
+        old_ids = set(old.song_ids) if old is not None else set()
+        new_ids = set(song_ids)
+        added_ids = [id for id in song_ids if id not in old_ids]
+        removed = [id for id in old.song_ids
+                   if id not in new_ids] if old is not None else []
+        added, missing = get_songs(added_ids)
+        if missing:
+            # Leave them out of the snapshot to retry them next time
+            missing_ids = set(missing)
+            song_ids = [id for id in song_ids if id not in missing_ids]
+        snapshot = self.snapshots[playlist] = Snapshot(playlist, song_ids,
+                                                       song_count)
+        return PlaylistChange(obj, added, removed, snapshot, missing)
+
+    def sync_many(self, playlists):
+        """Sync the playlists concurrently, yielding the changes in order"""
+        playlists = list(playlists)
+        if len(playlists) <= 1 or self.max_workers <= 1:
+            for playlist in playlists:
+                yield self.sync(playlist)
+            return
+        workers = min(self.max_workers, len(playlists))
+        with ThreadPoolExecutor(workers) as executor:
+            for change in executor.map(self.sync, playlists):
+                yield change
+
+    def forget(self, playlist_id):
+        """Stop tracking a playlist"""
+        self.snapshots.pop(playlist_id, None)
+
+    def save(self, fp):
+        """Write the snapshots to a text file as JSON lines"""
+        for snapshot in list(self.snapshots.values()):
+            fp.write(json.dumps(snapshot.to_dict()))
+            fp.write(u'\n')
+
+    def load(self, fp):
+        """Read the snapshots written by :meth:`save`"""
+        for line in fp:
+            if line.strip():
+                snapshot = Snapshot.from_dict(json.loads(line))
+                self.snapshots[snapshot.playlist_id] = snapshot
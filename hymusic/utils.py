@@ -1,30 +1,40 @@
 # -*- coding: utf-8 -*-
-import re
 import datetime
 import hashlib
 import base64
-from ._compat import json
+import io
+import pickle
+import threading
+import weakref
+from collections import OrderedDict
+from ._compat import json, orjson
 
 
 class lazy_property(object):
     """A property which is evaluated when first access its value, or manually
     set values to it. This is to save the cost of requests.
+
+    The value is stored in the attribute named with a leading underscore,
+    which should be declared in ``__slots__`` of the owner class.
     """
     def __init__(self, getter, name=None):
         self.getter = getter
         self.name = name or getter.__name__
+        self.attr = '_' + self.name
 
     def __get__(self, obj, cls):
         if obj is None:
             return self
-        if self.name not in obj.__dict__:
+        try:
+            return getattr(obj, self.attr)
+        except AttributeError:
             self.getter(obj)
-        return obj.__dict__[self.name]
+        return getattr(obj, self.attr)
 
     def __set__(self, obj, val):
         if obj is None:
             return
-        obj.__dict__[self.name] = val
+        setattr(obj, self.attr, val)
 
 
 def build_date(timeval):
@@ -57,5 +67,155 @@ def alternative_get(obj, *keys):
             return obj.get(key)
 
 
+_json_decoder = json.JSONDecoder()
+_JSONP_TAIL = ' \t\r\n);'
+
+
 def strip_json(text):
-    return json.loads(re.findall(r'.*?(\{.*\}).*', text)[0])
+    """Decode the JSON object wrapped in a JSONP response, such as
+    ``callback({...})``, scanning the text only once.
+    """
+    start = text.find('{')
+    if start < 0:
+        raise ValueError('No JSON object found')
+    if orjson is not None:
+        # Strip only the callback tail, orjson can't decode from an offset
+        end = len(text)
+        while end > start and text[end - 1] in _JSONP_TAIL:
+            end -= 1
+        if text[end - 1] == '}':
+            if start > 0 or end < len(text):
+                text = text[start:end]
+                start = 0
+            try:
+                return orjson.loads(text)
+            except orjson.JSONDecodeError:
+                pass
+    # Decode from the offset in place instead of copying the payload, the
+    # text after the first JSON object is ignored
+    return _json_decoder.raw_decode(text, start)[0]
+
+
+def chunked(items, size):
+    """Split a list into chunks with at most ``size`` items"""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class _PlainUnpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError('Refused to load %s.%s' % (module, name))
+
+
+def plain_loads(data):
+    """Load pickled data holding only builtin values, such as tuples, dicts,
+    strings and numbers. Loading any class or function is refused, so that
+    the data can't run code when loaded.
+    """
+    return _PlainUnpickler(io.BytesIO(data)).load()
+
+
+class IdentityMap(object):
+    """A thread-safe registry of model objects, so that the same entity is
+    represented by one object. It holds weak references to the objects, or
+    the most recently used ``maxsize`` objects if given.
+    """
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self._lock = threading.RLock()
+        if maxsize is None:
+            self._data = weakref.WeakValueDictionary()
+        else:
+            self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        with self._lock:
+            obj = self._data.get(key)
+            if obj is not None and self.maxsize is not None:
+                # Move to the end as the most recently used
+                del self._data[key]
+                self._data[key] = obj
+            return obj
+
+    def setdefault(self, key, obj):
+        """Return the object of the key if exists, otherwise store the
+        given one and return it.
+        """
+        with self._lock:
+            existing = self.get(key)
+            if existing is not None:
+                return existing
+            self._data[key] = obj
+            if self.maxsize is not None and len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            return obj
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class KeyMap(object):
+    """The alternative keys of the fields in the JSON objects of different
+    responses, such as ``id`` and ``songid``.
+
+    :param fields: the field names mapping to the alternative keys
+    """
+    def __init__(self, **fields):
+        self.fields = fields
+
+    def resolve(self, obj, shape=None):
+        """Return a dict mapping the field names to the first alternative
+        key in the object. The objects of a response share the same keys,
+        so the result is stored in the ``shape`` dict and reused for the
+        following objects given the same dict.
+        """
+        if shape is not None and 'keys' in shape:
+            return shape['keys']
+        keys = {}
+        for name, alternatives in self.fields.items():
+            for key in alternatives:
+                if key in obj:
+                    break
+            else:
+                key = alternatives[0]
+            keys[name] = key
+        if shape is not None:
+            shape['keys'] = keys
+        return keys
+
+
+class LazyList(object):
+    """A read-only sequence of models built from the raw JSON objects when
+    the items are accessed. The built items are kept.
+
+    :param raw: the list of JSON objects
+    :param build: the function building a model from a JSON object
+    """
+    __slots__ = ('raw', '_build', '_items')
+
+    def __init__(self, raw, build):
+        self.raw = raw
+        self._build = build
+        self._items = [None] * len(raw)
+
+    def __len__(self):
+        return len(self.raw)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self.raw)))]
+        item = self._items[i]
+        if item is None:
+            item = self._items[i] = self._build(self.raw[i])
+        return item
+
+    def __iter__(self):
+        for i in range(len(self.raw)):
+            yield self[i]
+
+    def __repr__(self):
+        built = sum(1 for item in self._items if item is not None)
+        return '<LazyList: %d items, %d built>' % (len(self.raw), built)